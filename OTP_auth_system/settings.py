@@ -59,20 +59,55 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Checks the blacklist in the cache instead of the token_blacklist tables.
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.CachedTokenRefreshSerializer',
 }
 
+# Opt-in write-behind for the OutstandingToken row written at every login: rows
+# are buffered and written with one bulk_create per TOKEN_WRITE_BEHIND_MAX_BATCH
+# logins or TOKEN_WRITE_BEHIND_MAX_DELAY seconds. Up to that many rows can be lost
+# if a worker dies; those tokens remain valid and can still be blacklisted.
+TOKEN_WRITE_BEHIND_ENABLED = os.getenv('TOKEN_WRITE_BEHIND_ENABLED', "False") == "True"
+TOKEN_WRITE_BEHIND_MAX_BATCH = int(os.getenv('TOKEN_WRITE_BEHIND_MAX_BATCH', 100))
+TOKEN_WRITE_BEHIND_MAX_DELAY = float(os.getenv('TOKEN_WRITE_BEHIND_MAX_DELAY', 1.0))
+
+# Revoked refresh tokens are reloaded from the blacklist table into the cache this often.
+TOKEN_REVOCATION_RELOAD_SECONDS = int(os.getenv('TOKEN_REVOCATION_RELOAD_SECONDS', 3600))
+
 # REST_FRAMEWORK settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication with a per-user cache, see users/authentication.py
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Reverse proxies in front of the app; X-Forwarded-For is ignored when 0.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
+}
+
+# Rate limits of the public endpoints, per client IP, email and phone number.
+# Sliding-window counters in the cache, see users/throttling.py.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', "True") == "True"
+RATE_LIMITS = {
+    'register': {'ip': '10/min', 'email': '3/10min', 'phone': '3/10min'},
+    'verify_otp': {'ip': '30/min', 'email': '10/10min'},
+    'login': {'ip': '20/min', 'email': '10/5min'},
+    'forgot_password': {'ip': '5/min', 'email': '3/15min'},
 }
 
+# Request/phase latency histograms and OTP counters, served in Prometheus text
+# format at /metrics (users/metrics.py). Scrapers authenticate with METRICS_TOKEN,
+# the endpoint answers 404 while it is unset.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', "True") == "True"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'users.middleware.MetricsMiddleware',
+    'users.middleware.DatabaseRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -104,15 +139,116 @@ WSGI_APPLICATION = 'OTP_auth_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. WAL lets readers run alongside the single writer, and
+# IMMEDIATE transactions plus the SQLITE_TIMEOUT busy timeout (sqlite3 sets
+# busy_timeout from it, so it is not repeated in SQLITE_PRAGMAS) make writers
+# queue instead of failing with "database is locked". Any other DB_ENGINE reads its connection from the
+# DB_* variables, and DB_REPLICA_HOSTS adds read replicas (see users/db_router.py).
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
+
+SQLITE_PRAGMAS = os.getenv(
+    'SQLITE_PRAGMAS',
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA temp_store=MEMORY;',
+)
+
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': int(os.getenv('SQLITE_TIMEOUT', 20)),
+                'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+                'init_command': SQLITE_PRAGMAS,
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.getenv('DB_NAME'),
+            'USER': os.getenv('DB_USER'),
+            'PASSWORD': os.getenv('DB_PASSWORD'),
+            'HOST': os.getenv('DB_HOST'),
+            'PORT': os.getenv('DB_PORT'),
+        }
+    }
+    for index, host in enumerate(h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+        DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+
+# Persistent connections only pay off under WSGI, where a worker thread keeps its
+# connection between requests. ASGI does not reuse them, so asgi.py defaults
+# DB_CONN_MAX_AGE to 0 there (use a pooler such as PgBouncer instead).
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+    database['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['users.db_router.PrimaryReplicaRouter']
+
+# After a user row is written, reads for that user stay on the primary for this
+# many seconds so a replica that is still catching up is never consulted.
+DATABASE_REPLICA_LAG_SECONDS = int(os.getenv('DATABASE_REPLICA_LAG_SECONDS', 10))
 
 AUTH_USER_MODEL = 'users.CustomeUser'  # Custom user model
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# OTP and pending registration state must be shared by every worker, so use
+# Redis when REDIS_URL is set. Without it each process gets its own LocMemCache,
+# which is only suitable for a single-process development server.
+
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'otp_auth')
+CACHE_VERSION = int(os.getenv('CACHE_VERSION', 1))
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+            'VERSION': CACHE_VERSION,
+            'TIMEOUT': 600,
+            'OPTIONS': {
+                # Passed to redis-py's ConnectionPool, one pool per process.
+                'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+                'socket_connect_timeout': float(os.getenv('REDIS_CONNECT_TIMEOUT', 1)),
+                'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', 1)),
+                'health_check_interval': 30,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'otp-auth-system',
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+            'VERSION': CACHE_VERSION,
+            'TIMEOUT': 600,
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('LOCMEM_CACHE_MAX_ENTRIES', 100000)),
+            },
+        }
+    }
+
+# Check refresh tokens against revocation marks in the cache instead of the
+# blacklist table. A missing mark means "not revoked", so this needs a cache that
+# every worker shares and that never evicts those keys (Redis with
+# maxmemory-policy noeviction); it is never enabled on the per-process LocMemCache.
+TOKEN_REVOCATION_CACHE = bool(REDIS_URL) and os.getenv('TOKEN_REVOCATION_CACHE', "True") == "True"
+
+# Users resolved from a JWT (and their rendered profile) are cached for this many
+# seconds, and invalidated on save by bumping a version key. Another worker only
+# sees that bump through a shared cache, so like TOKEN_REVOCATION_CACHE this is off
+# without Redis and every request loads the user from the database.
+USER_CACHE_ENABLED = bool(REDIS_URL) and os.getenv('USER_CACHE_ENABLED', "True") == "True"
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,6 +268,37 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# PASSWORD_HASHING_POLICY picks the hasher for new hashes (pbkdf2, scrypt or
+# argon2, argon2 needs argon2-cffi). The other hashers stay listed so existing
+# hashes still verify, and they are rehashed with the selected hasher and cost
+# settings on the next successful login. Measure with `manage.py bench_password_hashers`.
+
+PASSWORD_HASHING_POLICY = os.getenv('PASSWORD_HASHING_POLICY', 'pbkdf2')
+_POLICY_HASHERS = {
+    'pbkdf2': 'users.hashers.TunablePBKDF2PasswordHasher',
+    'scrypt': 'users.hashers.TunableScryptPasswordHasher',
+    'argon2': 'users.hashers.TunableArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_POLICY_HASHERS[PASSWORD_HASHING_POLICY]] + [
+    path for name, path in _POLICY_HASHERS.items() if name != PASSWORD_HASHING_POLICY
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Cost settings, Django's defaults are used for the ones that are not set.
+for _name in (
+    'PASSWORD_PBKDF2_ITERATIONS',
+    'PASSWORD_SCRYPT_WORK_FACTOR', 'PASSWORD_SCRYPT_BLOCK_SIZE', 'PASSWORD_SCRYPT_PARALLELISM',
+    'PASSWORD_ARGON2_TIME_COST', 'PASSWORD_ARGON2_MEMORY_COST', 'PASSWORD_ARGON2_PARALLELISM',
+):
+    if os.getenv(_name):
+        globals()[_name] = int(os.getenv(_name))
+
+# Async views hash in a bounded pool ('thread' or 'process') instead of on the event loop.
+PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -155,10 +322,64 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # EMAIL SETTINGS
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Pooled SMTP sessions are reused between sends, see users/utils/smtp_pool.py
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'users.utils.smtp_pool.PooledSMTPEmailBackend')
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', 4))
+EMAIL_POOL_IDLE_TIMEOUT = int(os.getenv('EMAIL_POOL_IDLE_TIMEOUT', 30))
 EMAIL_HOST = 'smtp.sendgrid.net'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'apikey'  # This is the literal string "apikey"
 EMAIL_HOST_PASSWORD = os.getenv('SENDGRID_API_KEY')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+
+# OTP OUTBOX SETTINGS
+# OTP emails are queued in the outbox table and delivered by `manage.py process_otp_outbox`.
+OTP_OUTBOX_MAX_ATTEMPTS = int(os.getenv('OTP_OUTBOX_MAX_ATTEMPTS', 5))
+OTP_OUTBOX_BACKOFF_SECONDS = int(os.getenv('OTP_OUTBOX_BACKOFF_SECONDS', 2))
+OTP_OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv('OTP_OUTBOX_MAX_BACKOFF_SECONDS', 300))
+OTP_OUTBOX_VISIBILITY_TIMEOUT = int(os.getenv('OTP_OUTBOX_VISIBILITY_TIMEOUT', 60))
+
+# OTP CHANNELS
+# Registration may ask for otp_channel 'email' or 'sms'; the other channel is the
+# fallback when delivery fails, or when the requested one has failed
+# OTP_CHANNEL_FAILURE_THRESHOLD times in a row (it is then skipped for
+# OTP_CHANNEL_DOWN_SECONDS). See users/utils/otp_channels.py.
+OTP_DEFAULT_CHANNEL = os.getenv('OTP_DEFAULT_CHANNEL', 'email')
+OTP_CHANNEL_FAILURE_THRESHOLD = int(os.getenv('OTP_CHANNEL_FAILURE_THRESHOLD', 5))
+OTP_CHANNEL_DOWN_SECONDS = int(os.getenv('OTP_CHANNEL_DOWN_SECONDS', 60))
+
+# SMS SETTINGS (Twilio-compatible Messages API)
+SMS_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
+SMS_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
+SMS_FROM_NUMBER = os.getenv('TWILIO_FROM_NUMBER', '')
+SMS_API_URL = os.getenv('SMS_API_URL', '')  # defaults to the Twilio Messages endpoint of the account
+SMS_MAX_CONCURRENCY = int(os.getenv('SMS_MAX_CONCURRENCY', 10))
+SMS_TIMEOUT = float(os.getenv('SMS_TIMEOUT', 5))
+
+# OTP SETTINGS
+# 'stored' keeps a keyed hash of a random OTP in the cache, 'stateless' derives
+# the OTP from SECRET_KEY, the email and an OTP_TIME_STEP-second time step.
+OTP_MODE = os.getenv('OTP_MODE', 'stored')
+OTP_TIME_STEP = int(os.getenv('OTP_TIME_STEP', 60))
+
+# MAILBOXLAYER SETTINGS
+MAILBOXLAYER_URL = os.getenv('MAILBOXLAYER_URL', 'http://apilayer.net/api/check')
+MAILBOXLAYER_TIMEOUT = (
+    float(os.getenv('MAILBOXLAYER_CONNECT_TIMEOUT', 2)),
+    float(os.getenv('MAILBOXLAYER_READ_TIMEOUT', 5)),
+)
+# When mailboxlayer is down, accept (True) or reject (False) the address.
+MAILBOXLAYER_FAIL_OPEN = os.getenv('MAILBOXLAYER_FAIL_OPEN', "True") == "True"
+MAILBOXLAYER_CACHE_TTL = int(os.getenv('MAILBOXLAYER_CACHE_TTL', 3600))
+MAILBOXLAYER_CACHE_SIZE = int(os.getenv('MAILBOXLAYER_CACHE_SIZE', 10000))
+MAILBOXLAYER_BREAKER_THRESHOLD = int(os.getenv('MAILBOXLAYER_BREAKER_THRESHOLD', 5))
+MAILBOXLAYER_BREAKER_RESET_SECONDS = int(os.getenv('MAILBOXLAYER_BREAKER_RESET_SECONDS', 30))
+
+# REGISTRATION UNIQUENESS SETTINGS
+# Optional per-process Bloom filter of taken emails / phone numbers, lets most
+# new-user uniqueness checks skip the database.
+USER_BLOOM_FILTER_ENABLED = os.getenv('USER_BLOOM_FILTER_ENABLED', "False") == "True"
+USER_BLOOM_FILTER_CAPACITY = int(os.getenv('USER_BLOOM_FILTER_CAPACITY', 1000000))
+USER_BLOOM_FILTER_ERROR_RATE = float(os.getenv('USER_BLOOM_FILTER_ERROR_RATE', 0.01))
+USER_BLOOM_FILTER_REBUILD_SECONDS = int(os.getenv('USER_BLOOM_FILTER_REBUILD_SECONDS', 300))
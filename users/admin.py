@@ -1,13 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin 
 from .models import CustomeUser
+from .paginators import EstimatedCountPaginator
 
 class CustomUserAdmin(UserAdmin):
     model = CustomeUser
     list_display = ['email', 'full_name', 'phone_number','role', 'is_staff', 'is_active', 'date_joined']
-    list_filter = ['is_staff', 'is_active', ]
+    list_filter = ['is_staff', 'is_active', 'role']
     ordering = ['email']
     search_fields = ['email', 'full_name', 'phone_number']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
@@ -0,0 +1,150 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from .serializers import RegisterUserSerializer
+from .throttling import acheck_rate_limit
+from .tokens import CachedBlacklistRefreshToken
+from .utils.email_validation import avalidate_email_with_mailboxlayer
+from .utils.uniqueness import afind_taken_fields
+from .utils import otp_store, stateless_otp
+from .utils.pending_registration import PendingRegistration, hash_otp
+from .utils.otp_outbox import aenqueue_otp
+from .utils.password_hashing import acheck_password, amake_password
+from .views import generate_otp, otp_email, otp_sent_message, verify_otp_and_create_user
+
+User = get_user_model()
+
+
+def throttled(wait):
+    response = JsonResponse(
+        {"detail": f"Request was throttled. Expected available in {wait} seconds."},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def parse_json(request):
+    """
+    The JSON object in the request body, {} for an empty body, None when the body
+    is not valid JSON or not an object.
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+# ASYNC API VIEWS
+# Served natively by an ASGI server (uvicorn), see OTP_auth_system/asgi.py.
+# They keep the request / response contract of RegisterUserView, VerifyOTPView
+# and LoginView; OTP verification itself is shared with VerifyOTPView.
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncRegisterUserView(View):
+    """
+    Async API View to register a new user via OTP and real-time email verification.
+    """
+
+    async def post(self, request):
+        data = parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+
+        wait = await acheck_rate_limit('register', request, data)
+        if wait is not None:
+            return throttled(wait)
+
+        # Field and password validation only, uniqueness is checked below with the async ORM.
+        serializer = RegisterUserSerializer(data=data, context={'check_uniqueness': False})
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        email = serializer.validated_data['email']
+        phone_number = serializer.validated_data['phone_number']
+
+        errors = await afind_taken_fields(email, phone_number)
+        if errors:
+            return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # 1. Validate email with mailboxlayer API
+        if not await avalidate_email_with_mailboxlayer(email):
+            return JsonResponse({"error": "Invalid email address."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Generate and queue OTP
+        otp = generate_otp(email)
+        subject, message = otp_email(otp)
+        try:
+            item = await aenqueue_otp(
+                email, subject=subject, message=message,
+                phone_number=phone_number, channel=serializer.validated_data.get('otp_channel'),
+            )
+        except Exception:
+            return JsonResponse({"error": "Failed to send OTP."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # 3. Store temporary user data in cache with OTP expiry time
+        record = PendingRegistration.from_validated_data(
+            serializer.validated_data, otp_store.OTP_EXPIRY_SECONDS,
+            password_hash=await amake_password(serializer.validated_data['password']),
+        )
+        otp_hash = None if stateless_otp.is_stateless() else hash_otp(email, otp)
+        await otp_store.astore_pending(email, record.encode(), otp_hash)
+
+        return JsonResponse({"message": otp_sent_message(item.channel)}, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncVerifyOTPView(View):
+    """
+    Async API View to verify OTP and create a new user
+    """
+
+    async def post(self, request):
+        data = parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+
+        wait = await acheck_rate_limit('verify_otp', request, data)
+        if wait is not None:
+            return throttled(wait)
+
+        body, status_code = await sync_to_async(verify_otp_and_create_user)(data.get("email"), data.get("otp"))
+        return JsonResponse(body, status=status_code)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncLoginView(View):
+    """
+    Async login API View, the password check runs in the bounded hash pool.
+    """
+
+    async def post(self, request):
+        data = parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+        email = data.get("email")
+        password = data.get("password")
+
+        wait = await acheck_rate_limit('login', request, data)
+        if wait is not None:
+            return throttled(wait)
+        if not email or not password:
+            return JsonResponse({"error": "Email and password are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = await User.objects.filter(email=email).afirst()
+        if user is None or not await acheck_password(user, password):
+            return JsonResponse({"non_field_errors": ["Invalid email or password."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        refresh = await sync_to_async(CachedBlacklistRefreshToken.for_user)(user)
+        return JsonResponse({
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        }, status=status.HTTP_200_OK)
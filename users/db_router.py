@@ -0,0 +1,25 @@
+from users.utils.db_routing import pick_replica, pin_primary
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary and pin the rest of the request there. Reads use a
+    replica only inside users.utils.db_routing.replica_reads(); everything else
+    falls through to Django's default choice.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return pick_replica()
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+# These keep the algorithm names of Django's hashers, so existing hashes still
+# verify. Changing a cost setting makes must_update() true for older hashes and
+# they are rehashed with the new cost on the next successful login.
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', ScryptPasswordHasher.work_factor)
+    block_size = getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', ScryptPasswordHasher.block_size)
+    parallelism = getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', ScryptPasswordHasher.parallelism)
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = getattr(settings, 'PASSWORD_ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
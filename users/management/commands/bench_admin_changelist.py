@@ -0,0 +1,85 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+CHANGELIST_URL = '/admin/users/customeuser/'
+SEED_PREFIX = 'seed-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the configured database with synthetic users (1M by default) and measure "
+        "admin changelist latency for listing, filtering, searching and deep pages. "
+        "Seeded rows use the 'seed-' email prefix; pass --cleanup to delete them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=20, help="Requests per scenario.")
+        parser.add_argument('--cleanup', action='store_true')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        self.seed(User, options['users'], options['batch_size'])
+
+        suffix = uuid.uuid4().hex[:8]
+        admin = User.objects.create_superuser(
+            email=f"bench-admin-{suffix}@example.com", password=uuid.uuid4().hex, username=f"bench-admin-{suffix}",
+            full_name="Benchmark Admin", phone_number=f"a{suffix}",
+        )
+        setup_test_environment()
+        client = Client()
+        client.force_login(admin)
+        scenarios = [
+            ("list", {}),
+            ("page 500", {'p': 499}),
+            ("filter is_active+role", {'is_active__exact': 1, 'role__exact': 'recruiter'}),
+            ("search email prefix", {'q': f"{SEED_PREFIX}12345"}),
+            ("search phone", {'q': "7000012345"}),
+        ]
+        try:
+            for label, params in scenarios:
+                timings = []
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    response = client.get(CHANGELIST_URL, params)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        self.stderr.write(f"{label}: HTTP {response.status_code}")
+                        break
+                timings.sort()
+                self.stdout.write(
+                    f"{label:<24} p50 {statistics.median(timings):>8.1f} ms"
+                    f"  p95 {timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0]:>8.1f} ms"
+                )
+        finally:
+            admin.delete()
+            if options['cleanup']:
+                deleted, _ = User.objects.filter(email__startswith=SEED_PREFIX).delete()
+                self.stdout.write(f"Deleted {deleted} seeded user(s).")
+
+    def seed(self, User, total, batch_size):
+        existing = User.objects.filter(email__startswith=SEED_PREFIX).count()
+        if existing >= total:
+            self.stdout.write(f"{existing} seeded users already present.")
+            return
+        now = timezone.now()
+        started = time.perf_counter()
+        for start in range(existing, total, batch_size):
+            User.objects.bulk_create([
+                User(
+                    email=f"{SEED_PREFIX}{index}@example.com", username=f"{SEED_PREFIX}{index}",
+                    full_name=f"Seed User {index}", phone_number=f"7{index:09d}", password='!',
+                    role='recruiter' if index % 5 == 0 else 'jobseeker', is_active=index % 10 != 0,
+                    date_joined=now - timezone.timedelta(minutes=index),
+                )
+                for index in range(start, min(start + batch_size, total))
+            ])
+        self.stdout.write(f"Seeded {total - existing} users in {time.perf_counter() - started:.1f}s.")
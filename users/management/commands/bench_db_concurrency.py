@@ -0,0 +1,91 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections
+
+# The settings before this change: no persistent connections, rollback journal,
+# no busy timeout and deferred transactions.
+BASELINE = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL;', 'timeout': 5},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent login lookups and registration inserts per second against the "
+        "configured default database, with the pre-tuning settings and with the current "
+        "ones. Each operation ends like a request does (close_old_connections), so "
+        "CONN_MAX_AGE takes effect. Rows it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Share of operations that insert a user.")
+
+    def handle(self, *args, **options):
+        database = connections['default'].settings_dict
+        current = {'CONN_MAX_AGE': database['CONN_MAX_AGE'], 'OPTIONS': dict(database['OPTIONS'])}
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            BASELINE['OPTIONS'] = dict(database['OPTIONS'])
+
+        self.prefix = f"dbbench-{uuid.uuid4().hex[:6]}"
+        User = get_user_model()
+        User.objects.create_user(
+            email=f"{self.prefix}-login@example.com", password="x", username=f"{self.prefix}-login",
+            full_name="Benchmark", phone_number=f"l{self.prefix[-6:]}",
+        )
+        try:
+            for label, config in (("before", BASELINE), ("after", current)):
+                ops, errors = self.run(config, options)
+                self.stdout.write(f"{label:<8} {ops / options['seconds']:>10.1f} ops/s  {errors} error(s)")
+        finally:
+            self.apply(current)
+            User.objects.filter(email__startswith=self.prefix).delete()
+
+    def apply(self, config):
+        # Django copies settings_dict into each thread's connection wrapper, so this
+        # has to happen before the worker threads start.
+        connections['default'].close()
+        connections.settings['default'].update(config)
+
+    def run(self, config, options):
+        self.apply(config)
+        User = get_user_model()
+        deadline = time.perf_counter() + options['seconds']
+        lock = threading.Lock()
+        totals = {'ops': 0, 'errors': 0}
+        login_email = f"{self.prefix}-login@example.com"
+
+        def worker(worker_id):
+            ops = errors = 0
+            while time.perf_counter() < deadline:
+                try:
+                    if (ops % 100) < options['write_ratio'] * 100:
+                        ident = f"{self.prefix}-{worker_id}-{ops}-{uuid.uuid4().hex[:4]}"
+                        User.objects.create(
+                            email=f"{ident}@example.com", username=ident, full_name="Benchmark",
+                            phone_number=uuid.uuid4().hex[:15], password='!',
+                        )
+                    else:
+                        User.objects.get(email=login_email)
+                    ops += 1
+                except OperationalError:
+                    errors += 1
+                finally:
+                    close_old_connections()
+            connections.close_all()
+            with lock:
+                totals['ops'] += ops
+                totals['errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals['ops'], totals['errors']
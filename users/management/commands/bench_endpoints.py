@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import platform
+import re
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from users.management.commands.loadtest_register import percentile
+from users.models import OTPOutbox
+from users.utils import email_validation, otp_outbox
+from users.utils.stand_ins import LatencyEmailBackend, MailboxlayerStub
+
+API_PREFIX = '/api/users/'
+OTP_PATTERN = re.compile(r'Your OTP is (\d+)')
+PASSWORD = "Str0ng-pass-phrase"
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end latency/throughput benchmark of every users endpoint. Each virtual "
+        "user registers, verifies the OTP, logs in, refreshes, reads and updates the "
+        "profile, requests and uses a password reset, logs out and deactivates; odd "
+        "users use the async/* register, verify and login views. Mailboxlayer and SMTP "
+        "are replaced by local stand-ins with --mailbox-latency / --smtp-latency. "
+        "--modes wsgi/asgi run in-process through Django's test Client/AsyncClient; "
+        "--base-url targets a running server instead (start it with RATE_LIMIT_ENABLED=False "
+        "and MAILBOXLAYER_URL set to the stub URL this command prints, on the same database). "
+        "Results are written as JSON and can be compared against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help="Virtual users per mode.")
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--modes', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--base-url', help="Benchmark a running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--label', default='live', help="Result name for --base-url, e.g. gunicorn or uvicorn.")
+        parser.add_argument('--mailbox-latency', type=float, default=0.05, help="Seconds.")
+        parser.add_argument('--mailbox-port', type=int, default=0)
+        parser.add_argument('--smtp-latency', type=float, default=0.1, help="Seconds per message.")
+        parser.add_argument('--output', default='bench-results.json')
+        parser.add_argument('--baseline', help="JSON results of an earlier run to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed relative regression.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        self.run_id = uuid.uuid4().hex[:8]
+        stub = MailboxlayerStub(latency=options['mailbox_latency'], port=options['mailbox_port']).start()
+        LatencyEmailBackend.latency = options['smtp_latency']
+        os.environ.setdefault('MAILBOXLAYER_API_KEY', 'bench')
+        self.stdout.write(f"mailboxlayer stand-in at {stub.url}")
+
+        stop_drain = threading.Event()
+        drainer = threading.Thread(target=self.drain, args=(stop_drain,), daemon=True)
+        results = {}
+        original_url = email_validation.MAILBOXLAYER_URL
+        email_validation.MAILBOXLAYER_URL = stub.url
+        try:
+            with override_settings(
+                RATE_LIMIT_ENABLED=False,
+                EMAIL_BACKEND='users.utils.stand_ins.LatencyEmailBackend',
+                ALLOWED_HOSTS=['*'],
+            ):
+                drainer.start()
+                if options['base_url']:
+                    results[options['label']] = asyncio.run(self.run_live(options))
+                for mode in [] if options['base_url'] else options['modes']:
+                    results[mode] = self.run_wsgi(options) if mode == 'wsgi' else asyncio.run(self.run_asgi(options))
+        finally:
+            stop_drain.set()
+            drainer.join()
+            email_validation.MAILBOXLAYER_URL = original_url
+            stub.stop()
+            prefix = f"bench-{self.run_id}-"
+            get_user_model().objects.filter(email__startswith=prefix).delete()
+            OTPOutbox.objects.filter(recipient__startswith=prefix).delete()
+
+        report = {
+            'meta': {
+                'run_id': self.run_id,
+                'python': platform.python_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'users': options['users'],
+                'concurrency': options['concurrency'],
+                'mailbox_latency': options['mailbox_latency'],
+                'smtp_latency': options['smtp_latency'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.print_report(results)
+        self.stdout.write(f"Wrote {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                regressions = self.compare(json.load(handle)['results'], results, options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+
+    def drain(self, stop):
+        # Deliver queued OTP mail through the SMTP stand-in, like the outbox workers.
+        try:
+            while not stop.is_set():
+                if not otp_outbox.drain_outbox():
+                    stop.wait(0.2)
+        finally:
+            connections.close_all()
+
+    def otp_for(self, email):
+        message = OTPOutbox.objects.filter(recipient=email).order_by('-id').values_list('message', flat=True).first()
+        match = OTP_PATTERN.search(message or '')
+        return match.group(1) if match else None
+
+    def steps(self, index):
+        """
+        The requests of one virtual user, as (name, method, path, payload builder).
+        Builders get the state collected so far and return (payload, auth header).
+        """
+        email = self.email_for(index)
+        prefix = 'async/' if index % 2 else ''
+        phone = f"8{int(self.run_id, 16) % 10 ** 4:04d}{index:05d}"
+        profile = {'full_name': "Bench User", 'phone_number': phone, 'role': 'jobseeker', 'bio': "benchmark"}
+        bearer = lambda state: f"Bearer {state.get('access')}"
+        return [
+            (f'{prefix}register', 'post', f'{prefix}register/', lambda state: ({
+                'email': email, 'password': PASSWORD, 'confirm_password': PASSWORD,
+                'full_name': "Bench User", 'phone_number': phone,
+            }, None)),
+            (f'{prefix}verify-otp', 'post', f'{prefix}verify-otp/', lambda state: ({'email': email, 'otp': state.get('otp')}, None)),
+            (f'{prefix}login', 'post', f'{prefix}login/', lambda state: ({'email': email, 'password': PASSWORD}, None)),
+            ('token/refresh', 'post', 'token/refresh/', lambda state: ({'refresh': state.get('refresh')}, None)),
+            ('profile GET', 'get', 'profile/', lambda state: (None, bearer(state))),
+            ('profile PUT', 'put', 'profile/', lambda state: (profile, bearer(state))),
+            ('profile PATCH', 'patch', 'profile/', lambda state: ({'bio': "patched"}, bearer(state))),
+            ('forgot-password', 'post', 'forgot-password/', lambda state: ({'email': email}, None)),
+            ('logout', 'post', 'logout/', lambda state: ({'refresh_token': state.get('refresh')}, bearer(state))),
+            ('profile DELETE', 'delete', 'profile/', lambda state: (None, bearer(state))),
+            ('reset-password', 'post', 'reset-password/', lambda state: (
+                {'token': state.get('reset_token'), 'new_password': PASSWORD + "!"}, None,
+            )),
+        ]
+
+    def email_for(self, index):
+        return f"bench-{self.run_id}-{index}@u{index}.bench.example"
+
+    def collect(self, state, body):
+        # Keep the tokens later steps need from a response body.
+        for key in ('access', 'refresh', 'reset_token'):
+            if isinstance(body, dict) and body.get(key):
+                state[key] = body[key]
+
+    def run_wsgi(self, options):
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def flow(index):
+            client = Client()
+            state = {}
+            try:
+                for name, method, path, build in self.steps(index):
+                    payload, auth = build(state)
+                    extra = {'HTTP_AUTHORIZATION': auth} if auth else {}
+                    started = time.perf_counter()
+                    response = getattr(client, method)(API_PREFIX + path, payload, content_type='application/json', **extra)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        samples[name].append((elapsed, response.status_code < 400))
+                    if name.endswith('register'):
+                        state['otp'] = self.otp_for(self.email_for(index))
+                    self.collect(state, self.json_body(response.content))
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(flow, range(options['users'])))
+        return self.summarize(samples, time.perf_counter() - started)
+
+    async def run_asgi(self, options):
+        samples = defaultdict(list)
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        otp_for = sync_to_async(self.otp_for)
+
+        async def flow(index):
+            async with semaphore:
+                client = AsyncClient()
+                state = {}
+                email = self.email_for(index)
+                for name, method, path, build in self.steps(index):
+                    payload, auth = build(state)
+                    extra = {'headers': {'Authorization': auth}} if auth else {}
+                    started = time.perf_counter()
+                    response = await getattr(client, method)(
+                        API_PREFIX + path, payload, content_type='application/json', **extra,
+                    )
+                    samples[name].append((time.perf_counter() - started, response.status_code < 400))
+                    if name.endswith('register'):
+                        state['otp'] = await otp_for(email)
+                    self.collect(state, self.json_body(response.content))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(flow(index) for index in range(options['users'])))
+        return self.summarize(samples, time.perf_counter() - started)
+
+    async def run_live(self, options):
+        import aiohttp
+
+        samples = defaultdict(list)
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        otp_for = sync_to_async(self.otp_for)
+        base = options['base_url'].rstrip('/') + API_PREFIX
+
+        async def flow(session, index):
+            async with semaphore:
+                state = {}
+                email = self.email_for(index)
+                for name, method, path, build in self.steps(index):
+                    payload, auth = build(state)
+                    headers = {'Authorization': auth} if auth else {}
+                    started = time.perf_counter()
+                    async with session.request(method.upper(), base + path, json=payload, headers=headers) as response:
+                        content = await response.read()
+                    samples[name].append((time.perf_counter() - started, response.status < 400))
+                    if name.endswith('register'):
+                        state['otp'] = await otp_for(email)
+                    self.collect(state, self.json_body(content))
+
+        connector = aiohttp.TCPConnector(limit=options['concurrency'])
+        async with aiohttp.ClientSession(connector=connector) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(flow(session, index) for index in range(options['users'])))
+            return self.summarize(samples, time.perf_counter() - started)
+
+    def json_body(self, content):
+        try:
+            return json.loads(content or b'null')
+        except ValueError:
+            return None
+
+    def summarize(self, samples, elapsed):
+        endpoints = {}
+        for name, values in samples.items():
+            latencies = [latency for latency, _ in values]
+            endpoints[name] = {
+                'requests': len(values),
+                'errors': sum(1 for _, ok in values if not ok),
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'mean_ms': statistics.fmean(latencies) * 1000,
+            }
+        total = sum(len(values) for values in samples.values())
+        return {'elapsed_s': elapsed, 'requests_per_s': total / elapsed if elapsed else 0.0, 'endpoints': endpoints}
+
+    def print_report(self, results):
+        for mode, result in results.items():
+            self.stdout.write(f"\n[{mode}] {result['requests_per_s']:.1f} req/s over {result['elapsed_s']:.1f}s")
+            for name, stats in result['endpoints'].items():
+                self.stdout.write(
+                    f"  {name:<20} {stats['requests']:>6} req {stats['errors']:>5} err  "
+                    f"p50 {stats['p50_ms']:>8.1f}ms  p95 {stats['p95_ms']:>8.1f}ms  p99 {stats['p99_ms']:>8.1f}ms"
+                )
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for mode, result in results.items():
+            base = baseline.get(mode)
+            if not base:
+                continue
+            if result['requests_per_s'] < base['requests_per_s'] * (1 - tolerance):
+                regressions.append(f"{mode}: throughput {base['requests_per_s']:.1f} -> {result['requests_per_s']:.1f} req/s")
+            for name, stats in result['endpoints'].items():
+                before = base['endpoints'].get(name)
+                if before and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                    regressions.append(f"{mode} {name}: p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+                if before and stats['errors'] > before['errors']:
+                    regressions.append(f"{mode} {name}: errors {before['errors']} -> {stats['errors']}")
+        self.stdout.write("\nRegressions:" if regressions else "\nNo regressions against the baseline.")
+        for line in regressions:
+            self.stdout.write(f"  {line}")
+        return regressions
@@ -0,0 +1,50 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from users.tokens import CachedBlacklistRefreshToken
+from users.utils import token_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure refresh tokens issued per second at login (the OutstandingToken write), "
+        "with and without write-behind batching. Uses the configured database; the rows "
+        "it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(
+            email=f"bench-{suffix}@example.com", password=uuid.uuid4().hex, username=f"bench-{suffix}",
+            full_name="Benchmark", phone_number=f"0{suffix}",
+        )
+        try:
+            for enabled in (False, True):
+                rate = self.run(user, options['logins'], enabled, options['batch_size'])
+                label = f"write-behind (batch {options['batch_size']})" if enabled else "synchronous insert"
+                self.stdout.write(f"{label:<28} {rate:>10.1f} logins/s")
+        finally:
+            OutstandingToken.objects.filter(user=user).delete()
+            user.delete()
+
+    def run(self, user, logins, enabled, batch_size):
+        original_enabled, original_buffer = token_buffer.WRITE_BEHIND_ENABLED, token_buffer.outstanding_tokens
+        token_buffer.WRITE_BEHIND_ENABLED = enabled
+        token_buffer.outstanding_tokens = token_buffer.OutstandingTokenBuffer(max_batch=batch_size)
+        try:
+            started = time.perf_counter()
+            for _ in range(logins):
+                CachedBlacklistRefreshToken.for_user(user)
+            token_buffer.outstanding_tokens.flush()
+            return logins / (time.perf_counter() - started)
+        finally:
+            token_buffer.WRITE_BEHIND_ENABLED, token_buffer.outstanding_tokens = original_enabled, original_buffer
@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+
+from users import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what the metrics instrumentation costs: the per-call price of a phase "
+        "timer and a histogram observation, and end-to-end latency of a cheap endpoint "
+        "with and without MetricsMiddleware, in alternating rounds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200_000, help="Calls for the micro benchmarks.")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per round.")
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--path', default='/api/users/profile/', help="Unauthenticated GET, no DB work.")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        started = time.perf_counter()
+        for _ in range(iterations):
+            metrics.phase_duration.observe(0.003, 'bench', 'observe')
+        observe_ns = (time.perf_counter() - started) / iterations * 1e9
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with metrics.timed('bench'):
+                pass
+        timer_ns = (time.perf_counter() - started) / iterations * 1e9
+
+        self.stdout.write(f"histogram observe  {observe_ns:>8.0f} ns/call")
+        self.stdout.write(f"timed() block      {timer_ns:>8.0f} ns/call")
+
+        setup_test_environment()
+        without = [m for m in settings.MIDDLEWARE if m != 'users.middleware.MetricsMiddleware']
+        on, off = [], []
+        for _ in range(options['rounds']):
+            with override_settings(METRICS_ENABLED=True, ALLOWED_HOSTS=['*']):
+                on.append(self.round(Client(), options))
+            with override_settings(MIDDLEWARE=without, ALLOWED_HOSTS=['*']):
+                original, metrics.METRICS_ENABLED = metrics.METRICS_ENABLED, False
+                try:
+                    off.append(self.round(Client(), options))
+                finally:
+                    metrics.METRICS_ENABLED = original
+
+        on_us, off_us = statistics.median(on), statistics.median(off)
+        self.stdout.write(f"request, metrics off {off_us:>8.1f} us")
+        self.stdout.write(f"request, metrics on  {on_us:>8.1f} us")
+        self.stdout.write(f"overhead             {on_us - off_us:>8.1f} us ({(on_us / off_us - 1) * 100:+.1f}%)")
+
+    def round(self, client, options):
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            client.get(options['path'])
+        return (time.perf_counter() - started) / options['requests'] * 1e6
@@ -0,0 +1,47 @@
+import pickle
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from users.utils import otp_store, stateless_otp
+from users.utils.pending_registration import hash_otp, otp_matches
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stored and stateless OTP modes: verify latency on the configured "
+        "cache and OTP-related cache memory per 100k pending users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Pending users created for the latency run.")
+
+    def handle(self, *args, **options):
+        emails = [f"bench-otp-{i}@example.com" for i in range(options['users'])]
+
+        # Memory: what each mode keeps in the cache for the OTP itself, key plus pickled value.
+        stored_bytes = len(otp_store.otp_key(emails[0])) + len(pickle.dumps(hash_otp(emails[0], "123456")))
+        self.stdout.write(
+            f"OTP cache memory per 100k pending users: stored {stored_bytes * 100000 / 1024:.0f} KiB, "
+            f"stateless 0 KiB (attempt counter and record are the same in both modes)"
+        )
+
+        for email in emails:
+            cache.set(otp_store.otp_key(email), hash_otp(email, "123456"), timeout=300)
+            cache.set(otp_store.attempts_key(email), 0, timeout=300)
+        try:
+            self.report("stored, right code", emails, lambda email: otp_matches(email, "123456", otp_store.get_otp_state(email)[0]))
+            self.report("stored, wrong code", emails, lambda email: otp_matches(email, "000000", otp_store.get_otp_state(email)[0]))
+            codes = {email: stateless_otp.derive_otp(email) for email in emails}
+            self.report("stateless, right code", emails, lambda email: stateless_otp.verify_derived_otp(email, codes[email]))
+            self.report("stateless, wrong code", emails, lambda email: stateless_otp.verify_derived_otp(email, "000000"))
+        finally:
+            cache.delete_many([key for email in emails for key in (otp_store.otp_key(email), otp_store.attempts_key(email))])
+
+    def report(self, label, emails, check):
+        started = time.perf_counter()
+        for email in emails:
+            check(email)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<24} {elapsed / len(emails) * 1e6:>8.1f}us per verify (OTP check only)")
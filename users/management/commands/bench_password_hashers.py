@@ -0,0 +1,53 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Report password checks (≈ logins) per second per core for each hashing setting."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pbkdf2-iterations', type=int, nargs='*', default=[PBKDF2PasswordHasher.iterations, 600000, 260000])
+        parser.add_argument('--scrypt-work-factors', type=int, nargs='*', default=[ScryptPasswordHasher.work_factor, 2 ** 15])
+        parser.add_argument('--argon2-memory-costs', type=int, nargs='*', default=[Argon2PasswordHasher.memory_cost, 19456])
+        parser.add_argument('--seconds', type=float, default=2.0, help="Time spent measuring each setting.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Threads for the all-cores figure.")
+
+    def handle(self, *args, **options):
+        settings_to_measure = []
+        for iterations in options['pbkdf2_iterations']:
+            settings_to_measure.append((f"pbkdf2 iterations={iterations}", PBKDF2PasswordHasher, {'iterations': iterations}))
+        for work_factor in options['scrypt_work_factors']:
+            settings_to_measure.append((f"scrypt work_factor={work_factor}", ScryptPasswordHasher, {'work_factor': work_factor}))
+        for memory_cost in options['argon2_memory_costs']:
+            settings_to_measure.append((f"argon2 memory_cost={memory_cost}", Argon2PasswordHasher, {'memory_cost': memory_cost}))
+
+        self.stdout.write(f"{'setting':<34} {'ms/check':>9} {'logins/s/core':>14} {'logins/s (' + str(options['workers']) + ' threads)':>22}")
+        for label, base, attributes in settings_to_measure:
+            hasher = type('BenchHasher', (base,), attributes)()
+            try:
+                encoded = hasher.encode("Str0ng-pass-phrase", hasher.salt())
+            except (ImportError, ValueError) as e:
+                self.stdout.write(f"{label:<34} skipped: {e}")
+                continue
+
+            per_core = self.measure(hasher, encoded, options['seconds'], workers=1)
+            all_cores = self.measure(hasher, encoded, options['seconds'], workers=options['workers'])
+            self.stdout.write(f"{label:<34} {1000 / per_core:>9.1f} {per_core:>14.1f} {all_cores:>22.1f}")
+
+    def measure(self, hasher, encoded, seconds, workers):
+        def run():
+            count = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                hasher.verify("Str0ng-pass-phrase", encoded)
+                count += 1
+            return count
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            total = sum(pool.map(lambda _: run(), range(workers)))
+        return total / (time.perf_counter() - started)
@@ -0,0 +1,49 @@
+import time
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import views
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure a client polling GET /api/users/profile/: rendering every time (profile "
+        "cache bypassed), from the cached rendering, and revalidating with If-None-Match "
+        "(304). Reports requests/sec and bytes per response (status line, headers, body)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        user = get_user_model().objects.create_user(
+            email=f"bench-{suffix}@example.com", password=uuid.uuid4().hex, username=f"bench-{suffix}",
+            full_name="Benchmark User", phone_number=f"p{suffix}", bio="x" * 400, address="y" * 200,
+        )
+        setup_test_environment()
+        client = Client(headers={'Authorization': f"Bearer {AccessToken.for_user(user)}"})
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                etag = client.get('/api/users/profile/')['ETag']
+                with mock.patch.object(views, 'get_cached_profile', return_value=None):
+                    self.report("render every request", client, {}, options['requests'])
+                self.report("cached rendering", client, {}, options['requests'])
+                self.report("If-None-Match (304)", client, {'HTTP_IF_NONE_MATCH': etag}, options['requests'])
+        finally:
+            user.delete()
+
+    def report(self, label, client, extra, requests):
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = client.get('/api/users/profile/', **extra)
+        rate = requests / (time.perf_counter() - started)
+        header_bytes = sum(len(f"{name}: {value}\r\n") for name, value in response.items())
+        size = len(f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n\r\n") + header_bytes + len(response.content)
+        self.stdout.write(f"{label:<24} {response.status_code}  {rate:>9.1f} req/s  {size:>6} bytes/response")
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the plain SMTP backend with the pooled one against a local debugging server, "
+        "e.g. `python -m aiosmtpd -n -l localhost:8025`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=1, help="Messages sent per backend call.")
+
+    def handle(self, *args, **options):
+        backends = [
+            ('smtp', 'django.core.mail.backends.smtp.EmailBackend'),
+            ('pooled', 'users.utils.smtp_pool.PooledSMTPEmailBackend'),
+        ]
+        for label, backend in backends:
+            elapsed = self.run(backend, options)
+            rate = options['messages'] / elapsed if elapsed else 0
+            self.stdout.write(f"{label:<8} {options['messages']} messages in {elapsed:.3f}s ({rate:.1f} msg/s)")
+
+    def run(self, backend, options):
+        batch_size = max(options['batch_size'], 1)
+        started = time.perf_counter()
+        for offset in range(0, options['messages'], batch_size):
+            count = min(batch_size, options['messages'] - offset)
+            # A fresh backend per call, the way the outbox workers and send_mail use it.
+            email_connection = get_connection(
+                backend, host=options['host'], port=options['port'],
+                username='', password='', use_tls=False,
+            )
+            email_connection.send_messages([
+                EmailMessage(
+                    subject="benchmark",
+                    body="Your OTP is 123456.",
+                    from_email=settings.DEFAULT_FROM_EMAIL or 'bench@example.com',
+                    to=[f"user{offset + i}@example.com"],
+                )
+                for i in range(count)
+            ])
+        return time.perf_counter() - started
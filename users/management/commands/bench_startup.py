@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before its first request: set Django up, build the WSGI
+# application and load the URLconf (and with it every view module).
+BOOT_SCRIPT = """
+import json, os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OTP_auth_system.settings')
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+application = get_wsgi_application()
+get_resolver().url_patterns
+rss_kb = 0
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({'rss_kb': rss_kb, 'modules': sorted(sys.modules)}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# Integrations that should only be imported once a request needs them.
+# `requests` is not listed: rest_framework.compat imports it at boot whenever
+# it is installed, so its presence in sys.modules says nothing about our code.
+LAZY_MODULES = ['aiohttp', 'twilio', 'sendgrid', 'pyotp']
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold worker start: boot a fresh interpreter with `python -X importtime`, "
+        "report wall time, RSS and the slowest top-level imports, and fail when a budget "
+        "is exceeded, a lazily loaded integration is imported at boot, or the run is "
+        "slower than a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help="Slowest imports to list.")
+        parser.add_argument('--max-boot-ms', type=float, help="Fail above this median boot time.")
+        parser.add_argument('--max-rss-mb', type=float, help="Fail above this RSS after boot.")
+        parser.add_argument('--lazy-modules', nargs='*', default=LAZY_MODULES)
+        parser.add_argument('--output', help="Write the results as JSON.")
+        parser.add_argument('--baseline', help="JSON from an earlier run to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.15)
+
+    def handle(self, *args, **options):
+        boots = [self.boot() for _ in range(options['runs'])]
+        boot_ms = statistics.median(boot['wall_ms'] for boot in boots)
+        rss_mb = statistics.median(boot['rss_kb'] for boot in boots) / 1024
+        imports = boots[-1]['imports']
+
+        self.stdout.write(f"boot (median of {len(boots)}) {boot_ms:>8.1f} ms")
+        self.stdout.write(f"import time (self total)  {sum(i['self_us'] for i in imports) / 1000:>8.1f} ms")
+        self.stdout.write(f"RSS after boot            {rss_mb:>8.1f} MB")
+        self.stdout.write("\nslowest top-level imports (cumulative):")
+        top_level = sorted((i for i in imports if i['depth'] == 0), key=lambda i: -i['cumulative_us'])
+        for entry in top_level[:options['top']]:
+            self.stdout.write(f"  {entry['cumulative_us'] / 1000:>8.1f} ms  {entry['module']}")
+
+        loaded = set(boots[-1]['modules'])
+        eager = [name for name in options['lazy_modules'] if name in loaded]
+        result = {'boot_ms': boot_ms, 'rss_mb': rss_mb, 'eager_modules': eager}
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({**result, 'imports': top_level}, handle, indent=2)
+
+        failures = [f"{name} is imported at boot" for name in eager]
+        if options['max_boot_ms'] and boot_ms > options['max_boot_ms']:
+            failures.append(f"boot {boot_ms:.1f} ms > {options['max_boot_ms']} ms")
+        if options['max_rss_mb'] and rss_mb > options['max_rss_mb']:
+            failures.append(f"RSS {rss_mb:.1f} MB > {options['max_rss_mb']} MB")
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+            for key, unit in (('boot_ms', 'ms'), ('rss_mb', 'MB')):
+                if result[key] > baseline[key] * (1 + options['tolerance']):
+                    failures.append(f"{key} {baseline[key]:.1f} -> {result[key]:.1f} {unit}")
+
+        if failures:
+            raise CommandError("Startup regression: " + "; ".join(failures))
+        self.stdout.write("\nStartup within budget.")
+
+    def boot(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'OTP_auth_system.settings')}
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        if completed.returncode != 0:
+            raise CommandError(f"Worker boot failed:\n{completed.stderr[-2000:]}")
+
+        imports = []
+        for line in completed.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                imports.append({
+                    'module': module, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us),
+                    'depth': (len(indent) - 1) // 2,
+                })
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+        return {'wall_ms': wall_ms, 'rss_kb': report['rss_kb'], 'modules': report['modules'], 'imports': imports}
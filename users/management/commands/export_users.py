@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from users.utils.user_export import RENDERERS, filtered_users, iter_user_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream users to CSV or JSON Lines with keyset pagination on id. "
+        "With --state-file only users created since the previous run are exported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(RENDERERS), default='csv')
+        parser.add_argument('--output', help="Output file, defaults to stdout.")
+        parser.add_argument('--role')
+        parser.add_argument('--active', choices=['true', 'false'])
+        parser.add_argument('--joined-after', help="ISO datetime, inclusive.")
+        parser.add_argument('--joined-before', help="ISO datetime, exclusive.")
+        parser.add_argument('--after-id', type=int, default=0, help="Only export users with a larger id.")
+        parser.add_argument('--state-file', help="Remembers the last exported id between runs.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        after_id = options['after_id']
+        if options['state_file'] and os.path.exists(options['state_file']):
+            with open(options['state_file']) as handle:
+                after_id = max(after_id, json.load(handle)['last_id'])
+
+        queryset = filtered_users(
+            role=options['role'],
+            is_active=None if options['active'] is None else options['active'] == 'true',
+            joined_after=self.parse(options['joined_after']),
+            joined_before=self.parse(options['joined_before']),
+        )
+
+        last_id = after_id
+        exported = 0
+
+        def rows():
+            nonlocal last_id, exported
+            for row in iter_user_rows(queryset, after_id=after_id, chunk_size=options['chunk_size']):
+                last_id = row[0]
+                exported += 1
+                yield row
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in RENDERERS[options['format']](rows()):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['state_file']:
+            with open(options['state_file'], 'w') as handle:
+                json.dump({'last_id': last_id}, handle)
+        self.stderr.write(f"Exported {exported} user(s), last id {last_id}.")
+
+    def parse(self, value):
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError(f"Invalid datetime {value!r}.")
+        return parsed
@@ -0,0 +1,151 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from users.utils import uniqueness
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _hash(password):
+    return make_password(password or None)
+
+
+def read_records(path, file_format):
+    """
+    Stream records from a CSV (with a header row) or JSON Lines file.
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import users from a CSV or JSON Lines file with email, full_name, phone_number "
+        "and password (or password_hash) columns, and optionally role. The file is streamed, "
+        "passwords are hashed in a process pool and rows are inserted with bulk_create in "
+        "transactional batches. Existing emails / phone numbers are skipped. Progress is "
+        "checkpointed, so an interrupted import continues where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Password hashing processes.")
+        parser.add_argument('--checkpoint', help="Checkpoint file, defaults to <path>.checkpoint.")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+
+        state = {'records': 0, 'inserted': 0, 'skipped': 0}
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as handle:
+                state = json.load(handle)
+            self.stdout.write(f"Resuming after {state['records']} record(s).")
+
+        records = islice(read_records(path, file_format), state['records'], None)
+        started = time.perf_counter()
+        done_at_start = state['records']
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+
+                inserted, skipped = self.import_batch(batch, pool, options['workers'])
+                state['records'] += len(batch)
+                state['inserted'] += inserted
+                state['skipped'] += skipped
+                self.save_checkpoint(checkpoint_path, state)
+
+                rate = (state['records'] - done_at_start) / (time.perf_counter() - started)
+                self.stdout.write(
+                    f"{state['records']} read, {state['inserted']} inserted, "
+                    f"{state['skipped']} skipped ({rate:.0f} rows/s)"
+                )
+
+        # bulk_create sends no post_save, so the Bloom filters never saw these users.
+        uniqueness.mark_stale()
+        self.stdout.write(self.style.SUCCESS(
+            f"Import finished: {state['inserted']} inserted, {state['skipped']} skipped."
+        ))
+
+    def import_batch(self, batch, pool, workers):
+        User = get_user_model()
+        records, seen_emails, seen_phones = [], set(), set()
+        for record in batch:
+            email = User.objects.normalize_email((record.get('email') or '').strip())
+            phone_number = (record.get('phone_number') or '').strip()
+            if not email or not phone_number or email in seen_emails or phone_number in seen_phones:
+                continue
+            seen_emails.add(email)
+            seen_phones.add(phone_number)
+            records.append((email, phone_number, record))
+
+        # One lookup per batch for both unique columns.
+        taken_emails, taken_phones = set(), set()
+        for email, phone_number in User.objects.filter(
+            Q(email__in=seen_emails) | Q(phone_number__in=seen_phones)
+        ).values_list('email', 'phone_number'):
+            taken_emails.add(email)
+            taken_phones.add(phone_number)
+        records = [r for r in records if r[0] not in taken_emails and r[1] not in taken_phones]
+
+        to_hash = [record.get('password') for _, _, record in records if not record.get('password_hash')]
+        hashes = iter(pool.map(_hash, to_hash, chunksize=max(1, len(to_hash) // (workers * 4))))
+
+        roles = {value for value, _ in User.ROLE_CHOICES}
+        users = []
+        for email, phone_number, record in records:
+            users.append(User(
+                email=email,
+                # The inherited username column is unique, so it can't stay '' for every imported row.
+                username=User.objects.default_username(email),
+                password=record.get('password_hash') or next(hashes),
+                full_name=(record.get('full_name') or '').strip(),
+                phone_number=phone_number,
+                role=record.get('role') if record.get('role') in roles else 'jobseeker',
+            ))
+
+        # A user registered since the lookup above must not abort the batch, so conflicts
+        # are skipped. The password hashes are salted, so a row with our (email, password)
+        # pair is one this batch inserted.
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=len(users) or None, ignore_conflicts=True)
+        ours = {(user.email, user.password) for user in users}
+        inserted = sum(
+            1 for row in User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'password')
+            if row in ours
+        )
+        return inserted, len(batch) - inserted
+
+    def save_checkpoint(self, checkpoint_path, state):
+        temporary = f"{checkpoint_path}.tmp"
+        with open(temporary, 'w') as handle:
+            json.dump(state, handle)
+        os.replace(temporary, checkpoint_path)
@@ -0,0 +1,77 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync and async registration endpoints of a running server, e.g. "
+        "`uvicorn OTP_auth_system.asgi:application` with MAILBOXLAYER_URL pointing at a stub."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api/users/')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--paths', nargs='+', default=['register/', 'async/register/'])
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            result = asyncio.run(self.run(options['base_url'] + path, options['requests'], options['concurrency']))
+            self.stdout.write(
+                f"{path:<18} {result['ok']}/{options['requests']} ok  "
+                f"{result['rps']:.1f} req/s  "
+                f"p50 {result['p50'] * 1000:.1f}ms  p95 {result['p95'] * 1000:.1f}ms  "
+                f"p99 {result['p99'] * 1000:.1f}ms  mean {result['mean'] * 1000:.1f}ms"
+            )
+
+    async def run(self, url, total, concurrency):
+        import aiohttp
+
+        latencies = []
+        ok = 0
+        semaphore = asyncio.Semaphore(concurrency)
+        run_id = uuid.uuid4().hex[:8]
+
+        async def register(session, i):
+            nonlocal ok
+            payload = {
+                'email': f"load-{run_id}-{i}@example.com",
+                'password': "Str0ng-pass-phrase",
+                'confirm_password': "Str0ng-pass-phrase",
+                'full_name': "Load Test",
+                'phone_number': f"9{i:09d}",
+            }
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, json=payload) as response:
+                    await response.read()
+                    if response.status == 200:
+                        ok += 1
+                latencies.append(time.perf_counter() - started)
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(register(session, i) for i in range(total)))
+            elapsed = time.perf_counter() - started
+
+        return {
+            'ok': ok,
+            'rps': total / elapsed if elapsed else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': statistics.fmean(latencies) if latencies else 0.0,
+        }
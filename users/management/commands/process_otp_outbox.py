@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.utils.otp_outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OTP messages from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Maximum concurrent senders.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Messages claimed per poll.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain a single batch and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = drain_outbox(batch_size=options['batch_size'], max_workers=options['workers'])
+            if sent:
+                self.stdout.write(f"Sent {sent} OTP message(s).")
+            if options['once']:
+                break
+            if not sent:
+                time.sleep(options['poll_interval'])
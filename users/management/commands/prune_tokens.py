@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from users.utils.token_revocation import is_revoked
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted refresh tokens in small batches, "
+        "so the tables are never locked for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+        parser.add_argument('--report', action='store_true', help="Print table sizes and blacklist lookup latency before and after.")
+        parser.add_argument('--samples', type=int, default=200, help="Lookups timed by --report.")
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self.report("before", options['samples'])
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # Each batch is two short autocommit DELETEs on primary keys.
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lt=now)
+                .order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            self.stdout.write(f"Deleted {deleted} expired token(s)...")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired token(s)."))
+        if options['report']:
+            self.report("after", options['samples'])
+
+    def report(self, label, samples):
+        outstanding = OutstandingToken.objects.count()
+        blacklisted = BlacklistedToken.objects.count()
+        jtis = list(OutstandingToken.objects.values_list('jti', flat=True).order_by('?')[:samples])
+        if not jtis:
+            jtis = [str(random.random())]
+
+        started = time.perf_counter()
+        for jti in jtis:
+            BlacklistedToken.objects.filter(token__jti=jti).exists()
+        db_lookup = (time.perf_counter() - started) / len(jtis)
+
+        is_revoked(jtis[0])  # load the cache-resident set before timing it
+        started = time.perf_counter()
+        for jti in jtis:
+            is_revoked(jti)
+        cache_lookup = (time.perf_counter() - started) / len(jtis)
+
+        self.stdout.write(
+            f"[{label}] outstanding={outstanding} blacklisted={blacklisted} "
+            f"db lookup={db_lookup * 1e6:.1f}us cache lookup={cache_lookup * 1e6:.1f}us"
+        )
@@ -1,9 +1,22 @@
+import hashlib
+
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import transaction
 
 class CustomeUserManager(BaseUserManager):
     """
     Custome user manager for creating users and superusers.
     """
+    def default_username(self, email):
+        """
+        username is unique on AbstractUser but unused here, so mirror the email.
+        An email longer than the column gets a digest of it instead, which stays unique.
+        """
+        max_length = self.model._meta.get_field('username').max_length
+        if len(email) <= max_length:
+            return email
+        return hashlib.sha256(email.encode()).hexdigest()
+
     def create_user(self, email, password=None, **extra_fields):
         """
         Create and return a user with an email and password.
@@ -14,11 +27,25 @@ class CustomeUserManager(BaseUserManager):
         if not password:
             raise ValueError('The password field must be set')
         email = self.normalize_email(email)
+        extra_fields.setdefault('username', self.default_username(email))
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
     
+    def create_user_with_password_hash(self, email, password_hash, **extra_fields):
+        """
+        Create a user from already validated data whose password is already hashed.
+
+        This is a single INSERT, the unique constraints on email and phone_number
+        do the uniqueness check, so an IntegrityError means one of them is taken.
+        """
+        extra_fields.setdefault('username', self.default_username(email))
+        user = self.model(email=email, password=password_hash, **extra_fields)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db, force_insert=True)
+        return user
+    
     def create_superuser(self, email, password=None, **extra_fields):
         """
         Create and return a superuser with an email and password.
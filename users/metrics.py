@@ -0,0 +1,159 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# In-process metrics in Prometheus text format. Each worker process keeps its own
+# values; scrape every worker (or sum them) when running several.
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_view = ContextVar('metrics_current_view', default='none')
+
+_registry = []
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{{{format_labels(self.labelnames, labels)}}} {value}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, *labels):
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(self._values.items()):
+            base = format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}'
+            yield f"{self.name}_sum{{{base}}} {total}"
+            yield f"{self.name}_count{{{base}}} {cumulative}"
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+request_duration = Histogram(
+    'users_http_request_duration_seconds', "Request latency by view.", ('view', 'method', 'status'),
+)
+phase_duration = Histogram(
+    'users_phase_duration_seconds', "Time spent per phase inside a view.", ('view', 'phase'),
+)
+otp_events = Counter(
+    'users_otp_events_total', "OTP lifecycle events.", ('event',),
+)
+
+
+class timed:
+    """
+    Time a phase of the current request, as a context manager or as a decorator
+    on sync or async functions: `with timed('cache'):` / `@timed('mailboxlayer')`.
+    """
+    __slots__ = ('phase', 'started')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        phase_duration.observe(time.perf_counter() - self.started, current_view.get(), self.phase)
+
+    def __call__(self, func):
+        phase = self.phase
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    phase_duration.observe(time.perf_counter() - started, current_view.get(), phase)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                phase_duration.observe(time.perf_counter() - started, current_view.get(), phase)
+        return wrapper
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    connection.execute_wrapper() hook that records every ORM query as the 'db' phase.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        phase_duration.observe(time.perf_counter() - started, current_view.get(), 'db')
@@ -0,0 +1,81 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from users import metrics
+from users.utils import db_routing
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Give every request a fresh replica/primary routing state, so a write in one
+    request does not pin unrelated requests served by the same thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = db_routing.start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            db_routing.end_request(tokens)
+
+    async def __acall__(self, request):
+        tokens = db_routing.start_request()
+        try:
+            return await self.get_response(request)
+        finally:
+            db_routing.end_request(tokens)
+
+
+class MetricsMiddleware:
+    """
+    Record request latency per view, and label the phase timings taken while
+    the view runs (users.metrics.timed) with the same view name.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.current_view.set('unmatched')
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self.observe(request, response, started)
+            return response
+        finally:
+            metrics.current_view.reset(token)
+
+    async def __acall__(self, request):
+        token = metrics.current_view.set('unmatched')
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self.observe(request, response, started)
+            return response
+        finally:
+            metrics.current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        metrics.current_view.set(match.url_name or match.view_name if match else 'unmatched')
+
+    def observe(self, request, response, started):
+        metrics.request_duration.observe(
+            time.perf_counter() - started, metrics.current_view.get(), request.method, response.status_code,
+        )
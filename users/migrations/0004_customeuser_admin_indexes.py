@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = {
+    'users_custo_email_trgm_idx': 'email',
+    'users_custo_full_na_trgm_idx': 'full_name',
+    'users_custo_phone_n_trgm_idx': 'phone_number',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # The admin's icontains lookups compile to UPPER(col::text) LIKE UPPER(%s) on
+    # PostgreSQL, which a GIN trigram index over the same expression can serve.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "users_customeuser" '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_otpoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customeuser',
+            index=models.Index(fields=['role'], name='users_custo_role_888560_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customeuser',
+            index=models.Index(fields=['is_active'], name='users_custo_is_acti_4067da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customeuser',
+            index=models.Index(fields=['date_joined'], name='users_custo_date_jo_b6a824_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_customeuser_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otpoutbox',
+            name='channel',
+            field=models.CharField(choices=[('email', 'Email'), ('sms', 'SMS')], default='email', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='otpoutbox',
+            name='fallback_channel',
+            field=models.CharField(blank=True, choices=[('email', 'Email'), ('sms', 'SMS')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='otpoutbox',
+            name='fallback_recipient',
+            field=models.CharField(blank=True, default='', max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='otpoutbox',
+            name='recipient',
+            field=models.CharField(max_length=254),
+        ),
+    ]
@@ -29,5 +29,113 @@ class CustomeUser(AbstractUser, PermissionsMixin):
 
     objects = CustomeUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['role']),
+            models.Index(fields=['is_active']),
+            models.Index(fields=['date_joined']),
+        ]
+
     def __str__(self):
         return f"{self.email} ({self.role})"
+
+    # Dirty-field tracking: the column values loaded from (or last written to) the
+    # database are kept, and save() of an existing row only updates the fields that
+    # differ from them, or skips the write entirely when nothing changed.
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_fields()
+        return instance
+
+    def snapshot_fields(self):
+        # Deferred fields are not in __dict__ and stay out of the snapshot.
+        self._original_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        """
+        Names of the fields whose value differs from the one in the database.
+        """
+        original = getattr(self, '_original_values', {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in original or original[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        tracked = (
+            not self._state.adding
+            and hasattr(self, '_original_values')
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        )
+        if tracked:
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is not None and hasattr(self, '_original_values'):
+            for name in kwargs['update_fields']:
+                attname = self._meta.get_field(name).attname
+                self._original_values[attname] = self.__dict__[attname]
+        else:
+            self.snapshot_fields()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or not hasattr(self, '_original_values'):
+            self.snapshot_fields()
+            return
+        # Only the reloaded fields are clean now. This is also how Django loads a
+        # deferred field, so pending edits to other fields must stay dirty.
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                self._original_values[attname] = self.__dict__[attname]
+
+
+class OTPOutbox(models.Model):
+    """
+    Durable outbox of OTP messages waiting to be delivered by the outbox workers.
+    A message that fails on its channel is moved to the fallback channel, if any.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    CHANNEL_CHOICES = (
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    )
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default='email')
+    recipient = models.CharField(max_length=254)
+    fallback_channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, blank=True, default='')
+    fallback_recipient = models.CharField(max_length=254, blank=True, default='')
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} ({self.status})"
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ADMIN_EXACT_COUNT_LIMIT = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+
+
+def estimated_row_count(model, using):
+    """
+    Planner statistics on PostgreSQL, the highest primary key elsewhere. Both are
+    O(1) lookups instead of a full scan; None when no estimate is available.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+        else:
+            table = connection.ops.quote_name(model._meta.db_table)
+            column = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT MAX({column}) FROM {table}")
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large tables. An unfiltered queryset is counted from an estimate;
+    a filtered one is counted exactly up to ADMIN_EXACT_COUNT_LIMIT rows, after
+    which the count is capped so the last pages are not reachable.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:ADMIN_EXACT_COUNT_LIMIT + 1].count()
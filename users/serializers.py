@@ -1,6 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from users.metrics import timed
+from users.tokens import CachedBlacklistRefreshToken
+from users.utils.otp_channels import OTP_CHANNELS
+from users.utils.db_routing import replica_reads
+from users.utils.uniqueness import find_taken_fields
 
 User = get_user_model()
 
@@ -10,33 +16,28 @@ class RegisterUserSerializer(serializers.ModelSerializer):
     """
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     confirm_password = serializers.CharField(write_only=True, required=True)
+    otp_channel = serializers.ChoiceField(choices=OTP_CHANNELS, write_only=True, required=False)
 
     class Meta:
         model = User
-        fields = ['email', 'password', 'confirm_password', 'full_name', 'phone_number']
-
-    def validate_email(self, value):
-        """
-        Validate that the email is unique.
-        """
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email already exists.")
-        return value
-    
-    def validate_phone_number(self, value):
-        """
-        Validate that the phone number is unique.
-        """
-        if User.objects.filter(phone_number=value).exists():
-            raise serializers.ValidationError("Phonr number already exists.")
-        return value
+        fields = ['email', 'password', 'confirm_password', 'full_name', 'phone_number', 'otp_channel']
+        # Uniqueness of both fields is checked with one query in validate(), not by UniqueValidators.
+        extra_kwargs = {
+            'email': {'validators': []},
+            'phone_number': {'validators': []},
+        }
 
     def validate(self, data):
         """
-        Validate the password and confirm_password fields.
+        Validate the password and confirm_password fields, then that email and phone number are unique.
         """
         if data['password'] != data['confirm_password']:
             raise serializers.ValidationError("Password and Confirm Password do not match.")
+
+        if self.context.get('check_uniqueness', True):
+            errors = find_taken_fields(data['email'], data['phone_number'])
+            if errors:
+                raise serializers.ValidationError(errors)
         return data
 
     def create(self, validated_data):
@@ -44,6 +45,7 @@ class RegisterUserSerializer(serializers.ModelSerializer):
         Create a new user instance.
         """
         validated_data.pop("confirm_password")
+        validated_data.pop("otp_channel", None)
         user = User.objects.create_user(**validated_data)
         return user
 
@@ -62,11 +64,15 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         try:
-            user = User.objects.get(email=email)  # Retrieve user by email.
+            # A replica can serve this unless the user was written moments ago.
+            with replica_reads(email):
+                user = User.objects.get(email=email)  # Retrieve user by email.
         except User.DoesNotExist:
             raise serializers.ValidationError("Invalid email or password.")  # Handle invalid email.
 
-        if not user.check_password(password):  # Check if the password matches.
+        with timed('hashing'):
+            password_ok = user.check_password(password)
+        if not password_ok:  # Check if the password matches.
             raise serializers.ValidationError("Invalid email or password.")
 
         
@@ -86,4 +92,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'role', 'is_active', 'date_joined'
         ]
         read_only_fields = ['email', 'is_active', 'date_joined']
-            
\ No newline at end of file
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh serializer that checks the blacklist in the cache.
+    """
+    token_class = CachedBlacklistRefreshToken
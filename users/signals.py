@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.metrics import time_query
+from users.utils.db_routing import mark_written
+from users.utils.uniqueness import known_users
+from users.utils.user_cache import invalidate_user
+
+
+@receiver(post_save, sender=get_user_model())
+def add_user_to_known_users(sender, instance, created, **kwargs):
+    """
+    Keep this process's Bloom filter of taken emails / phone numbers up to date.
+    """
+    if created or kwargs.get('update_fields') is None or {'email', 'phone_number'} & set(kwargs['update_fields']):
+        known_users.add_user(instance.email, instance.phone_number)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached copy used by CachedJWTAuthentication whenever the user changes.
+    """
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def mark_user_written(sender, instance, **kwargs):
+    """
+    Read-your-writes: keep reads about this user on the primary for a while.
+    """
+    mark_written(instance.email, instance.pk)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """
+    Time every query on every connection, including the ones async views use
+    from sync_to_async threads, as the 'db' phase.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
@@ -1,3 +1,1497 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.models import OTPOutbox
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.serializers import RegisterUserSerializer
+from users.utils import email_validation, otp_outbox, otp_store, smtp_pool, stateless_otp, token_buffer, uniqueness
+from users.utils.bloom import BloomFilter
+from users.utils.pending_registration import PendingRegistration, hash_otp, otp_matches
+from users.utils.user_cache import get_cached_profile, get_version
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OTPOutboxTests(TestCase):
+    def test_generate_and_send_otp_only_enqueues(self):
+        from users.views import generate_and_send_otp
+
+        otp, channel = generate_and_send_otp("user@example.com")
+
+        self.assertEqual(len(mail.outbox), 0)
+        item = OTPOutbox.objects.get()
+        self.assertEqual(channel, 'email')
+        self.assertEqual(item.recipient, "user@example.com")
+        self.assertIn(otp, item.message)
+        self.assertEqual(item.status, 'pending')
+
+    def test_drain_outbox_delivers_pending_messages(self):
+        otp_outbox.enqueue_otp("a@example.com", "subject", "Your OTP is 111111.")
+        otp_outbox.enqueue_otp("b@example.com", "subject", "Your OTP is 222222.")
+
+        sent = otp_outbox.drain_outbox(batch_size=10, max_workers=1)
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OTPOutbox.objects.exclude(status='sent').exists())
+
+    def test_terminal_rows_do_not_keep_the_otp(self):
+        otp_outbox.enqueue_otp("a@example.com", "subject", "Your OTP is 111111.")
+        otp_outbox.drain_outbox(batch_size=10, max_workers=1)
+
+        failing = otp_outbox.enqueue_otp("b@example.com", "subject", "Your OTP is 222222.")
+        OTPOutbox.objects.filter(pk=failing.pk).update(attempts=otp_outbox.OUTBOX_MAX_ATTEMPTS - 1)
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=ConnectionError("smtp down")):
+            otp_outbox.drain_outbox(batch_size=10, max_workers=1)
+
+        self.assertEqual(
+            sorted(OTPOutbox.objects.values_list('status', 'message')), [('failed', ''), ('sent', '')],
+        )
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        item = otp_outbox.enqueue_otp("a@example.com", "subject", "Your OTP is 111111.")
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=ConnectionError("smtp down")):
+            sent = otp_outbox.drain_outbox(batch_size=10, max_workers=1)
+
+        item.refresh_from_db()
+        self.assertEqual(sent, 0)
+        self.assertEqual(item.status, 'pending')
+        self.assertEqual(item.attempts, 1)
+        self.assertGreater(item.next_attempt_at, timezone.now())
+
+        # Not due yet, the next drain leaves it alone.
+        self.assertEqual(otp_outbox.drain_outbox(batch_size=10, max_workers=1), 0)
+
+
+class PooledSMTPEmailBackendTests(TestCase):
+    def setUp(self):
+        smtp_pool._pools.clear()
+
+    def send(self):
+        backend = smtp_pool.PooledSMTPEmailBackend(host='localhost', port=8025, username='', password='', use_tls=False)
+        message = mail.EmailMessage("subject", "body", "from@example.com", ["to@example.com"])
+        return backend.send_messages([message])
+
+    @mock.patch('smtplib.SMTP')
+    def test_sessions_are_reused_between_backends(self, smtp_class):
+        self.assertEqual(self.send(), 1)
+        self.assertEqual(self.send(), 1)
+
+        self.assertEqual(smtp_class.call_count, 1)
+        self.assertEqual(smtp_class.return_value.sendmail.call_count, 2)
+
+    @mock.patch('smtplib.SMTP')
+    def test_dropped_session_is_reopened(self, smtp_class):
+        import smtplib
+
+        self.send()
+        smtp_class.return_value.sendmail.side_effect = [smtplib.SMTPServerDisconnected(), {}]
+
+        self.assertEqual(self.send(), 1)
+        self.assertEqual(smtp_class.call_count, 2)
+
+
+class StubMailboxlayerHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        email = parse_qs(urlparse(self.path).query)['email'][0]
+        self.requests_seen.append(email)
+        domain = email.rsplit('@', 1)[-1]
+        body = {
+            'email': email,
+            'mx_found': domain != 'nomx.example',
+            'smtp_check': domain != 'nomx.example' and not email.startswith('bounce'),
+            'catch_all': domain == 'corp.example',
+        }
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@mock.patch.dict('os.environ', {'MAILBOXLAYER_API_KEY': 'test-key'})
+class EmailValidationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), StubMailboxlayerHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/api/check"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubMailboxlayerHandler.requests_seen = []
+        email_validation.email_results.clear()
+        email_validation.domain_results.clear()
+        email_validation.breaker.record_success()
+        patcher = mock.patch.object(email_validation, 'MAILBOXLAYER_URL', self.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results_are_cached_per_email(self):
+        self.assertTrue(email_validation.validate_email_with_mailboxlayer("user@example.com"))
+        self.assertFalse(email_validation.validate_email_with_mailboxlayer("bounce@example.com"))
+        self.assertTrue(email_validation.validate_email_with_mailboxlayer("user@example.com"))
+
+        self.assertEqual(StubMailboxlayerHandler.requests_seen, ["user@example.com", "bounce@example.com"])
+
+    def test_domain_verdicts_skip_the_external_call(self):
+        self.assertTrue(email_validation.validate_email_with_mailboxlayer("first@corp.example"))
+        self.assertTrue(email_validation.validate_email_with_mailboxlayer("second@corp.example"))
+        self.assertFalse(email_validation.validate_email_with_mailboxlayer("first@nomx.example"))
+        self.assertFalse(email_validation.validate_email_with_mailboxlayer("second@nomx.example"))
+
+        self.assertEqual(StubMailboxlayerHandler.requests_seen, ["first@corp.example", "first@nomx.example"])
+
+    def test_open_breaker_skips_the_call_and_uses_the_fallback_verdict(self):
+        with mock.patch.object(email_validation, 'MAILBOXLAYER_URL', "http://127.0.0.1:1/api/check"):
+            for i in range(email_validation.MAILBOXLAYER_BREAKER_THRESHOLD):
+                email_validation.validate_email_with_mailboxlayer(f"user{i}@example.com")
+
+        with mock.patch.object(email_validation, 'MAILBOXLAYER_FAIL_OPEN', False):
+            self.assertFalse(email_validation.validate_email_with_mailboxlayer("user@example.com"))
+        self.assertEqual(StubMailboxlayerHandler.requests_seen, [])
+
+
+class CircuitBreakerTests(TestCase):
+    def test_half_open_breaker_admits_a_single_probe(self):
+        breaker = email_validation.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        with mock.patch('users.utils.email_validation.time.monotonic', return_value=1000.0):
+            breaker.record_failure()
+            breaker.record_failure()
+            self.assertFalse(breaker.allow_request())
+
+        with mock.patch('users.utils.email_validation.time.monotonic', return_value=1031.0):
+            self.assertEqual([breaker.allow_request() for _ in range(5)], [True, False, False, False, False])
+            breaker.record_failure()  # the probe failed, open again
+            self.assertFalse(breaker.allow_request())
+
+        with mock.patch('users.utils.email_validation.time.monotonic', return_value=1062.0):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_success()
+            self.assertEqual([breaker.allow_request() for _ in range(3)], [True, True, True])
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class OTPAttemptLimitTests(TestCase):
+    email = "user@example.com"
+
+    def setUp(self):
+        cache.clear()
+        otp_store.store_pending(self.email, b"record", hash_otp(self.email, "123456"))
+
+    def guess(self, otp):
+        from users.views import VerifyOTPView
+
+        request = APIRequestFactory().post('/api/users/verify-otp/', {"email": self.email, "otp": otp}, format='json')
+        return VerifyOTPView.as_view()(request)
+
+    def test_failed_guess_only_touches_the_attempt_counter(self):
+        with mock.patch.object(cache, 'set') as cache_set:
+            response = self.guess("000000")
+
+        self.assertEqual(response.status_code, 400)
+        cache_set.assert_not_called()
+        self.assertEqual(cache.get(otp_store.attempts_key(self.email)), 1)
+        self.assertEqual(cache.get(otp_store.data_key(self.email)), b"record")
+
+    def test_parallel_wrong_guesses_respect_the_limit(self):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            responses = list(pool.map(self.guess, [f"{i:06d}" for i in range(32)]))
+
+        invalid = [r for r in responses if r.status_code == 400 and "Invalid OTP" in r.data["error"]]
+        self.assertEqual(len(invalid), otp_store.MAX_OTP_ATTEMPTS - 1)
+        self.assertTrue(any(r.status_code == 403 for r in responses))
+
+        # The registration is gone, the right code no longer works either.
+        self.assertEqual(self.guess("123456").status_code, 400)
+        self.assertIsNone(cache.get(otp_store.data_key(self.email)))
+
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisOTPStoreTests(TestCase):
+    email = "user@example.com"
+
+    def setUp(self):
+        redis_cache = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://127.0.0.1:6379/0',
+                'KEY_PREFIX': 'otp_auth_test',
+                'OPTIONS': {'connection_class': fakeredis.FakeConnection} if fakeredis else {},
+            }
+        }
+        override = override_settings(CACHES=redis_cache)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+    def test_pending_registration_round_trip(self):
+        otp_store.store_pending(self.email, {"email": self.email}, "123456")
+
+        self.assertEqual(otp_store.get_otp_state(self.email), ("123456", 0))
+        self.assertEqual(otp_store.record_failed_attempt(self.email), 1)
+        self.assertEqual(otp_store.record_failed_attempt(self.email), 2)
+        self.assertEqual(otp_store.get_pending_data(self.email), {"email": self.email})
+
+        otp_store.clear_pending(self.email)
+        self.assertEqual(otp_store.get_otp_state(self.email), (None, 0))
+        self.assertIsNone(otp_store.record_failed_attempt(self.email))
+
+    def test_keys_expire_with_the_otp(self):
+        otp_store.store_pending(self.email, {"email": self.email}, "123456")
+
+        for key in otp_store.pending_keys(self.email):
+            raw_key = cache.make_and_validate_key(key)
+            ttl = cache._cache.get_client(raw_key).ttl(raw_key)
+            self.assertGreater(ttl, 0)
+            self.assertLessEqual(ttl, otp_store.OTP_EXPIRY_SECONDS)
+
+
+class PendingRegistrationTests(TestCase):
+    validated_data = {
+        'email': "user@Example.com",
+        'password': "Str0ng-pass-phrase",
+        'confirm_password': "Str0ng-pass-phrase",
+        'full_name': "Test User",
+        'phone_number': "9876543210",
+    }
+
+    def test_record_round_trip(self):
+        record = PendingRegistration.from_validated_data(self.validated_data, 600)
+        decoded = PendingRegistration.decode(record.encode())
+
+        self.assertEqual(decoded.user_fields(), record.user_fields())
+        self.assertEqual(decoded.expires_at, record.expires_at)
+        self.assertEqual(decoded.email, "user@example.com")
+        self.assertFalse(decoded.is_expired())
+        self.assertNotIn(b"Str0ng-pass-phrase", record.encode())
+
+    def test_record_is_much_smaller_than_the_pickled_payload(self):
+        import pickle
+        from collections import OrderedDict
+
+        record = PendingRegistration.from_validated_data(self.validated_data, 600)
+        old_payload = {
+            "data": OrderedDict(self.validated_data),
+            "otp": "123456",
+            "otp_attempts": 0,
+            "otp_expiry": timezone.now() + timezone.timedelta(seconds=600),
+        }
+        new_size = len(pickle.dumps(record.encode())) + len(pickle.dumps(hash_otp(record.email, "123456")))
+        old_size = len(pickle.dumps(old_payload))
+
+        # Most of what is left is the password hash, which the old payload didn't even have.
+        self.assertLess(new_size, old_size / 1.5)
+
+    def test_otp_hash(self):
+        otp_hash = hash_otp("user@example.com", "123456")
+
+        self.assertEqual(len(otp_hash), 16)
+        self.assertTrue(otp_matches("user@example.com", "123456", otp_hash))
+        self.assertFalse(otp_matches("user@example.com", "654321", otp_hash))
+        self.assertFalse(otp_matches("other@example.com", "123456", otp_hash))
+        self.assertFalse(otp_matches("user@example.com", None, otp_hash))
+
+
+def statements(captured):
+    """
+    SQL statements of a CaptureQueriesContext, without transaction bookkeeping.
+    """
+    bookkeeping = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+    return [q['sql'] for q in captured.captured_queries if not q['sql'].startswith(bookkeeping)]
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class VerifyOTPCreateUserTests(TestCase):
+    email = "new@example.com"
+    validated_data = {
+        'email': email,
+        'password': "Str0ng-pass-phrase",
+        'confirm_password': "Str0ng-pass-phrase",
+        'full_name': "New User",
+        'phone_number': "9876543210",
+    }
+
+    def setUp(self):
+        from users.views import store_temp_user_data
+
+        cache.clear()
+        record = PendingRegistration.from_validated_data(self.validated_data, 600)
+        store_temp_user_data(self.email, record, "123456")
+
+    def verify(self, email=email):
+        from users.views import VerifyOTPView
+
+        request = APIRequestFactory().post('/api/users/verify-otp/', {"email": email, "otp": "123456"}, format='json')
+        return VerifyOTPView.as_view()(request)
+
+    def register(self, email, phone_number):
+        from users.views import store_temp_user_data
+
+        data = {**self.validated_data, 'email': email, 'phone_number': phone_number}
+        store_temp_user_data(email, PendingRegistration.from_validated_data(data, 600), "123456")
+
+    def test_registrations_verified_in_a_row_get_distinct_usernames(self):
+        long_email = f"{'a' * 200}@example.com"
+        self.register("second@example.com", "9876543211")
+        self.register(long_email, "9876543212")
+
+        self.assertEqual(self.verify().status_code, 201)
+        self.assertEqual(self.verify("second@example.com").status_code, 201)
+        self.assertEqual(self.verify(long_email).status_code, 201)
+
+        usernames = list(get_user_model().objects.values_list('username', flat=True))
+        self.assertEqual(len(set(usernames)), 3)
+        self.assertTrue(all(0 < len(username) <= 150 for username in usernames))
+
+    def test_verify_creates_the_user_with_a_single_insert(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.verify()
+
+        self.assertEqual(response.status_code, 201)
+        sql = statements(captured)
+        self.assertEqual(len(sql), 1)
+        self.assertTrue(sql[0].startswith('INSERT'))
+
+        user = get_user_model().objects.get(email=self.email)
+        self.assertTrue(user.check_password("Str0ng-pass-phrase"))
+        self.assertIsNone(cache.get(otp_store.data_key(self.email)))
+
+    def test_taken_phone_number_is_reported_per_field(self):
+        get_user_model().objects.create_user(
+            email="existing@example.com", password="Str0ng-pass-phrase", username="existing",
+            full_name="Existing User", phone_number=self.validated_data['phone_number'],
+        )
+
+        response = self.verify()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'phone_number': ["Phonr number already exists."]})
+        self.assertFalse(get_user_model().objects.filter(email=self.email).exists())
+
+
+class RegisterUniquenessTests(TestCase):
+    def setUp(self):
+        uniqueness.known_users.reset()
+        get_user_model().objects.create_user(
+            email="taken@example.com", password="Str0ng-pass-phrase", username="taken",
+            full_name="Taken User", phone_number="9000000000",
+        )
+
+    def serializer(self, email, phone_number):
+        return RegisterUserSerializer(data={
+            'email': email,
+            'password': "Str0ng-pass-phrase",
+            'confirm_password': "Str0ng-pass-phrase",
+            'full_name': "New User",
+            'phone_number': phone_number,
+        })
+
+    def test_both_fields_are_checked_with_one_query(self):
+        serializer = self.serializer("taken@example.com", "9000000000")
+
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['email'], ["Email already exists."])
+        self.assertEqual(serializer.errors['phone_number'], ["Phonr number already exists."])
+
+    def test_only_the_taken_field_is_reported(self):
+        serializer = self.serializer("new@example.com", "9000000000")
+
+        self.assertFalse(serializer.is_valid())
+        self.assertNotIn('email', serializer.errors)
+        self.assertIn('phone_number', serializer.errors)
+
+    @mock.patch.object(uniqueness, 'BLOOM_ENABLED', True)
+    def test_bloom_filter_skips_the_query_for_new_users(self):
+        uniqueness.known_users.rebuild()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.serializer("new@example.com", "9111111111").is_valid())
+
+        serializer = self.serializer("taken@example.com", "9111111111")
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('email', serializer.errors)
+
+    @mock.patch.object(uniqueness, 'BLOOM_ENABLED', True)
+    def test_bloom_filter_learns_users_created_in_this_process(self):
+        uniqueness.known_users.rebuild()
+        get_user_model().objects.create_user(
+            email="later@example.com", password="Str0ng-pass-phrase", username="later",
+            full_name="Later User", phone_number="9222222222",
+        )
+
+        serializer = self.serializer("later@example.com", "9333333333")
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('email', serializer.errors)
+
+
+    @mock.patch.object(uniqueness, 'BLOOM_ENABLED', True)
+    def test_missing_filter_is_built_in_the_background_not_in_the_request(self):
+        with mock.patch.object(uniqueness.known_users, 'start_rebuild') as start_rebuild:
+            with self.assertNumQueries(1):
+                self.assertTrue(self.serializer("new@example.com", "9111111111").is_valid())
+        start_rebuild.assert_called_once_with()
+
+    def test_users_added_during_a_rebuild_survive_the_swap(self):
+        known_users = uniqueness.known_users
+        build = known_users.build
+
+        def build_then_register():
+            bloom = build()
+            known_users.add_user("racing@example.com", "9444444444")
+            return bloom
+
+        with mock.patch.object(known_users, 'build', build_then_register):
+            known_users.rebuild()
+        self.assertTrue(known_users.might_be_taken("racing@example.com", "9555555555"))
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"user{i}@example.com")
+
+        self.assertTrue(all(f"user{i}@example.com" in bloom for i in range(1000)))
+        false_positives = sum(f"other{i}@example.com" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class PasswordHashingPolicyTests(TestCase):
+    def test_changed_cost_rehashes_on_login(self):
+        from users.hashers import TunablePBKDF2PasswordHasher
+        from users.serializers import LoginSerializer
+
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="Str0ng-pass-phrase", username="user",
+            full_name="User", phone_number="9000000000",
+        )
+        old_hash = user.password
+
+        with mock.patch.object(TunablePBKDF2PasswordHasher, 'iterations', TunablePBKDF2PasswordHasher.iterations + 1):
+            serializer = LoginSerializer(data={"email": "user@example.com", "password": "Str0ng-pass-phrase"})
+            self.assertTrue(serializer.is_valid())
+
+        user.refresh_from_db()
+        self.assertNotEqual(user.password, old_hash)
+        self.assertTrue(user.password.startswith(f"pbkdf2_sha256${TunablePBKDF2PasswordHasher.iterations + 1}$"))
+
+    def test_acheck_password_runs_in_the_pool_and_rehashes(self):
+        from asgiref.sync import async_to_sync
+        from users.hashers import TunablePBKDF2PasswordHasher
+        from users.utils.password_hashing import acheck_password
+
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="Str0ng-pass-phrase", username="user",
+            full_name="User", phone_number="9000000000",
+        )
+
+        self.assertFalse(async_to_sync(acheck_password)(user, "wrong-password"))
+        with mock.patch.object(TunablePBKDF2PasswordHasher, 'iterations', TunablePBKDF2PasswordHasher.iterations + 1):
+            self.assertTrue(async_to_sync(acheck_password)(user, "Str0ng-pass-phrase"))
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith(f"pbkdf2_sha256${TunablePBKDF2PasswordHasher.iterations + 1}$"))
+
+
+@override_settings(USER_CACHE_ENABLED=True)
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Str0ng-pass-phrase", username="user",
+            full_name="User", phone_number="9000000000",
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_warm_profile_get_does_not_query_the_database(self):
+        self.client.get('/api/users/profile/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['email'], "user@example.com")
+
+    def test_profile_update_invalidates_the_cached_user(self):
+        self.client.get('/api/users/profile/')
+        self.client.patch('/api/users/profile/', {"full_name": "Renamed"}, format='json')
+
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(json.loads(response.content)['full_name'], "Renamed")
+
+    def test_deactivated_user_is_rejected_even_when_cached(self):
+        self.client.get('/api/users/profile/')
+        self.client.delete('/api/users/profile/')
+
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, 401)
+
+    @override_settings(USER_CACHE_ENABLED=False)
+    def test_without_a_shared_cache_every_request_reads_the_user(self):
+        from users.utils.user_cache import get_cached_user
+
+        self.client.get('/api/users/profile/')
+        self.assertEqual(get_cached_user(self.user.pk), (None, None))
+
+        # Changed by another worker, whose invalidation this process's cache would never see.
+        get_user_model().objects.filter(pk=self.user.pk).update(full_name="Renamed")
+        self.assertEqual(json.loads(self.client.get('/api/users/profile/').content)['full_name'], "Renamed")
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, 401)
+
+    def test_password_reset_invalidates_the_cached_user(self):
+        from users.utils.generate_reset_token import generate_reset_token
+        from users.utils.user_cache import get_cached_user
+
+        self.client.get('/api/users/profile/')
+        self.assertIsNotNone(get_cached_user(self.user.pk)[0])
+
+        self.client.post('/api/users/reset-password/', {
+            "token": generate_reset_token(self.user.pk), "new_password": "An0ther-pass-phrase",
+        }, format='json')
+
+        self.assertIsNone(get_cached_user(self.user.pk)[0])
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Str0ng-pass-phrase", username="user",
+            full_name="User", phone_number="9000000000",
+        )
+        self.client = APIClient()
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def test_logged_out_token_cannot_be_refreshed(self):
+        self.client.post('/api/users/logout/', {"refresh_token": str(self.refresh)}, format='json')
+
+        response = self.client.post('/api/users/token/refresh/', {"refresh": str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(TOKEN_REVOCATION_CACHE=True)
+    def test_blacklist_check_does_not_query_the_blacklist_tables(self):
+        from users.tokens import CachedBlacklistRefreshToken
+
+        token = str(self.refresh)
+        CachedBlacklistRefreshToken(token)  # loads the revoked set
+
+        with CaptureQueriesContext(connection) as captured:
+            CachedBlacklistRefreshToken(token)
+        self.assertFalse(any('blacklistedtoken' in sql for sql in statements(captured)))
+
+    @override_settings(TOKEN_REVOCATION_CACHE=True)
+    def test_revoked_set_is_reloaded_from_the_database(self):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from users.tokens import CachedBlacklistRefreshToken
+
+        RefreshToken(str(self.refresh)).blacklist()  # written by another code path, cache not told
+        cache.clear()
+
+        with self.assertRaises(TokenError):
+            CachedBlacklistRefreshToken(str(self.refresh))
+
+    @override_settings(TOKEN_REVOCATION_CACHE=True)
+    def test_only_the_lock_holder_reloads_the_revoked_set(self):
+        from users.utils import token_revocation
+
+        token_revocation.load_revoked()
+        cache.delete(token_revocation.LOADED_KEY)  # expired, time for a reload
+        cache.add(token_revocation.RELOAD_LOCK_KEY, 1)  # another request is reloading
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertFalse(token_revocation.is_revoked(self.refresh["jti"]))
+        self.assertEqual(statements(captured), [])
+
+        # Before any set was loaded, the others ask the table instead.
+        RefreshToken(str(self.refresh)).blacklist()
+        cache.delete(token_revocation.READY_KEY)
+        self.assertTrue(token_revocation.is_revoked(self.refresh["jti"]))
+
+    def test_revocation_is_checked_in_the_database_without_a_shared_cache(self):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from users.tokens import CachedBlacklistRefreshToken
+
+        CachedBlacklistRefreshToken(str(self.refresh))  # warms the cache-resident set
+        RefreshToken(str(self.refresh)).blacklist()  # e.g. another worker, cache not told
+
+        with self.assertRaises(TokenError):
+            CachedBlacklistRefreshToken(str(self.refresh))
+
+    def test_prune_tokens_deletes_only_expired_rows(self):
+        from django.core.management import call_command
+        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+        expired = RefreshToken.for_user(self.user)
+        OutstandingToken.objects.filter(jti=expired["jti"]).update(expires_at=timezone.now() - timezone.timedelta(days=1))
+        RefreshToken(str(expired)).blacklist()
+
+        call_command('prune_tokens', batch_size=1, stdout=mock.MagicMock())
+
+        self.assertFalse(OutstandingToken.objects.filter(jti=expired["jti"]).exists())
+        self.assertTrue(OutstandingToken.objects.filter(jti=self.refresh["jti"]).exists())
+
+
+class TokenWriteBehindTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Str0ng-pass-phrase", username="user",
+            full_name="User", phone_number="9000000000",
+        )
+        buffer = token_buffer.OutstandingTokenBuffer(max_batch=3, max_delay=60)
+        for patcher in (
+            mock.patch.object(token_buffer, 'WRITE_BEHIND_ENABLED', True),
+            mock.patch.object(token_buffer, 'outstanding_tokens', buffer),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(buffer.flush)
+
+    def login(self):
+        from users.tokens import CachedBlacklistRefreshToken
+
+        return CachedBlacklistRefreshToken.for_user(self.user)
+
+    def test_rows_are_written_in_one_batch(self):
+        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+        with self.assertNumQueries(0):
+            self.login()
+            self.login()
+        self.assertEqual(len(token_buffer.outstanding_tokens), 2)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.login()
+        self.assertEqual(len([sql for sql in statements(captured) if sql.startswith('INSERT')]), 1)
+        self.assertEqual(OutstandingToken.objects.filter(user=self.user).count(), 3)
+
+    def test_unflushed_token_can_be_blacklisted(self):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+        from users.tokens import CachedBlacklistRefreshToken
+
+        token = self.login()
+        CachedBlacklistRefreshToken(str(token)).blacklist()
+        token_buffer.outstanding_tokens.flush()
+
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=token["jti"]).exists())
+        with self.assertRaises(TokenError):
+            CachedBlacklistRefreshToken(str(token))
+
+
+@override_settings(RATE_LIMITS={'forgot_password': {'ip': '2/min', 'email': '3/min'}})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def forgot_password(self, email, ip="10.0.0.1", **extra):
+        from users.views import ForgotPasswordView
+
+        request = APIRequestFactory().post(
+            '/api/users/forgot-password/', {"email": email}, format='json', REMOTE_ADDR=ip, **extra,
+        )
+        return ForgotPasswordView.as_view()(request)
+
+    def test_limit_per_ip_returns_429_before_the_view_runs(self):
+        self.assertEqual(self.forgot_password("a@example.com").status_code, 200)
+        self.assertEqual(self.forgot_password("b@example.com").status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.forgot_password("c@example.com")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+        self.assertEqual(self.forgot_password("c@example.com", ip="10.0.0.2").status_code, 200)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_ip_limit(self):
+        for i in range(2):
+            self.forgot_password(f"{i}@example.com", HTTP_X_FORWARDED_FOR=f"192.0.2.{i}")
+
+        response = self.forgot_password("c@example.com", HTTP_X_FORWARDED_FOR="192.0.2.9")
+        self.assertEqual(response.status_code, 429)
+
+    def test_client_ip_behind_trusted_proxies(self):
+        from users.throttling import client_ip
+
+        request = APIRequestFactory().get('/', REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4, 203.0.113.7")
+        self.assertEqual(client_ip(request), "10.0.0.1")
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1}):
+            self.assertEqual(client_ip(request), "203.0.113.7")
+
+    def test_limit_per_email_across_ips(self):
+        for i in range(3):
+            self.assertEqual(self.forgot_password("a@example.com", ip=f"10.0.1.{i}").status_code, 200)
+
+        self.assertEqual(self.forgot_password("A@example.com", ip="10.0.1.9").status_code, 429)
+
+    def test_previous_window_counts_towards_the_estimate(self):
+        from users import throttling
+
+        with mock.patch('users.throttling.time.time', return_value=6000.0):  # start of a window
+            self.assertIsNone(throttling.hit("key", "4/min"))
+            self.assertIsNone(throttling.hit("key", "4/min"))
+            self.assertIsNone(throttling.hit("key", "4/min"))
+        with mock.patch('users.throttling.time.time', return_value=6060.0 + 15):  # previous window still weighs 0.75
+            self.assertIsNone(throttling.hit("key", "4/min"))
+            self.assertIsNotNone(throttling.hit("key", "4/min"))
+
+    def test_parse_rate(self):
+        from users.throttling import parse_rate
+
+        self.assertEqual(parse_rate("10/min"), (10, 60))
+        self.assertEqual(parse_rate("3/15min"), (3, 900))
+        self.assertEqual(parse_rate("100/day"), (100, 86400))
+        with self.assertRaises(ValueError):
+            parse_rate("ten per minute")
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+@mock.patch.object(stateless_otp, 'OTP_MODE', 'stateless')
+class StatelessOTPTests(TestCase):
+    email = "new@example.com"
+    validated_data = {
+        'email': email,
+        'password': "Str0ng-pass-phrase",
+        'confirm_password': "Str0ng-pass-phrase",
+        'full_name': "New User",
+        'phone_number': "9876543210",
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    def register(self):
+        from users.views import generate_otp, store_temp_user_data
+
+        otp = generate_otp(self.email)
+        store_temp_user_data(self.email, PendingRegistration.from_validated_data(self.validated_data, 600), otp)
+        return otp
+
+    def verify(self, otp):
+        from users.views import VerifyOTPView
+
+        request = APIRequestFactory().post('/api/users/verify-otp/', {"email": self.email, "otp": otp}, format='json')
+        return VerifyOTPView.as_view()(request)
+
+    def test_otp_is_not_stored(self):
+        self.register()
+        self.assertIsNone(cache.get(otp_store.otp_key(self.email)))
+
+    def test_derived_otp_creates_the_user(self):
+        otp = self.register()
+
+        self.assertEqual(self.verify(otp).status_code, 201)
+        self.assertTrue(get_user_model().objects.filter(email=self.email).exists())
+
+    def test_wrong_code_does_not_read_the_cache(self):
+        self.register()
+
+        with mock.patch.object(cache, 'get_many') as get_many, mock.patch.object(cache, 'get') as get:
+            response = self.verify("000000" if stateless_otp.derive_otp(self.email) != "000000" else "111111")
+        self.assertEqual(response.status_code, 400)
+        get_many.assert_not_called()
+        get.assert_not_called()
+        self.assertEqual(cache.get(otp_store.attempts_key(self.email)), 1)
+
+    def test_codes_expire(self):
+        now = time.time()
+        otp = stateless_otp.derive_otp(self.email, for_time=now)
+
+        self.assertTrue(stateless_otp.verify_derived_otp(self.email, otp, for_time=now + otp_store.OTP_EXPIRY_SECONDS - 60))
+        self.assertFalse(stateless_otp.verify_derived_otp(self.email, otp, for_time=now + otp_store.OTP_EXPIRY_SECONDS + 120))
+        self.assertFalse(stateless_otp.verify_derived_otp("other@example.com", otp, for_time=now))
+
+
+class ImportUsersCommandTests(TestCase):
+    def test_import_skips_duplicates_and_resumes_from_the_checkpoint(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        get_user_model().objects.create_user(
+            email="taken@example.com", password="Str0ng-pass-phrase", username="taken",
+            full_name="Taken", phone_number="9000000000",
+        )
+        rows = [
+            {"email": "a@example.com", "full_name": "A", "phone_number": "9000000001", "password": "Str0ng-pass-phrase"},
+            {"email": "taken@example.com", "full_name": "Taken", "phone_number": "9000000002", "password": "x"},
+            {"email": "b@example.com", "full_name": "B", "phone_number": "9000000001", "password": "x"},
+            {"email": "c@example.com", "full_name": "C", "phone_number": "9000000003", "password_hash": "!unusable", "role": "recruiter"},
+        ]
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "users.jsonl")
+        with open(path, 'w') as handle:
+            handle.write("\n".join(json.dumps(row) for row in rows[:2]) + "\n")
+
+        call_command('import_users', path, batch_size=10, workers=1, stdout=mock.MagicMock())
+        with open(path, 'a') as handle:
+            handle.write("\n".join(json.dumps(row) for row in rows[2:]) + "\n")
+        call_command('import_users', path, batch_size=10, workers=1, stdout=mock.MagicMock())
+
+        users = get_user_model().objects.exclude(email="taken@example.com").order_by('email')
+        self.assertEqual([user.email for user in users], ["a@example.com", "c@example.com"])
+        self.assertTrue(users[0].check_password("Str0ng-pass-phrase"))
+        self.assertEqual(users[1].role, "recruiter")
+        with open(f"{path}.checkpoint") as handle:
+            self.assertEqual(json.load(handle)['records'], 4)
+
+
+    @mock.patch.object(uniqueness, 'BLOOM_ENABLED', True)
+    def test_rows_inserted_concurrently_are_skipped_and_the_filters_rebuilt(self):
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        cache.clear()
+        uniqueness.known_users.rebuild()
+        User = get_user_model()
+        rows = [
+            {"email": "a@example.com", "full_name": "A", "phone_number": "9000000001", "password_hash": "!unusable"},
+            {"email": "b@example.com", "full_name": "B", "phone_number": "9000000002", "password_hash": "!unusable"},
+        ]
+        path = os.path.join(tempfile.mkdtemp(), "users.jsonl")
+        with open(path, 'w') as handle:
+            handle.write("\n".join(json.dumps(row) for row in rows) + "\n")
+
+        bulk_create = User.objects.bulk_create
+
+        def register_then_bulk_create(objs, **kwargs):
+            # A live registration lands between the pre-check and the INSERT.
+            User.objects.create_user(
+                email="b@example.com", password="Str0ng-pass-phrase", full_name="B", phone_number="9000000009",
+            )
+            return bulk_create(objs, **kwargs)
+
+        stdout = io.StringIO()
+        with mock.patch.object(User.objects, 'bulk_create', register_then_bulk_create):
+            call_command('import_users', path, batch_size=10, workers=1, stdout=stdout)
+
+        self.assertIn("Import finished: 1 inserted, 1 skipped.", stdout.getvalue())
+        self.assertEqual(User.objects.get(email="b@example.com").phone_number, "9000000009")
+        self.assertFalse(uniqueness.known_users.is_fresh())
+        uniqueness.known_users.rebuild()
+        self.assertTrue(uniqueness.known_users.might_be_taken("a@example.com", "9111111111"))
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class UserExportTests(TestCase):
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"user{index}@example.com", password="Str0ng-pass-phrase", username=f"user{index}",
+                full_name=f"User {index}", phone_number=f"90000000{index:02d}",
+                role="recruiter" if index % 2 else "jobseeker",
+            )
+            for index in range(5)
+        ]
+
+    def test_keyset_pages_cover_every_user_once(self):
+        from users.utils.user_export import filtered_users, iter_user_rows
+
+        rows = list(iter_user_rows(filtered_users(), chunk_size=2))
+        self.assertEqual([row[0] for row in rows], [user.pk for user in self.users])
+        rows = list(iter_user_rows(filtered_users(role="recruiter"), after_id=self.users[1].pk, chunk_size=2))
+        self.assertEqual([row[0] for row in rows], [self.users[3].pk])
+
+    def test_endpoint_streams_csv_to_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.get('/api/users/export/').status_code, 403)
+
+        admin = self.users[0]
+        admin.is_staff = True
+        admin.save()
+        client.force_authenticate(admin)
+        response = client.get('/api/users/export/', {'file_format': 'csv', 'role': 'jobseeker'})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["id", "email"])
+        self.assertEqual(len(lines), 1 + 3)
+
+    def test_endpoint_rejects_filters_it_cannot_parse(self):
+        admin = self.users[0]
+        admin.is_staff = True
+        admin.save()
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        for params in (
+            {'joined_after': "yesterday"},
+            {'joined_after': "2024-13-01"},
+            {'joined_before': "2024-02-30T00:00:00"},
+            {'is_active': "yes"},
+            {'is_active': "1"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(client.get('/api/users/export/', params).status_code, 400)
+
+        response = client.get('/api/users/export/', {'is_active': "False", 'joined_after': "2000-01-01T00:00:00Z"})
+        self.assertEqual(len(b"".join(response.streaming_content).decode().splitlines()), 1)
+
+    def test_command_exports_only_new_users_with_state_file(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        directory = tempfile.mkdtemp()
+        state_file = os.path.join(directory, "state.json")
+        output = os.path.join(directory, "users.jsonl")
+        call_command('export_users', format='jsonl', output=output, state_file=state_file, stderr=mock.MagicMock())
+        with open(output) as handle:
+            self.assertEqual(len(handle.readlines()), 5)
+
+        get_user_model().objects.create_user(
+            email="late@example.com", password="Str0ng-pass-phrase", username="late",
+            full_name="Late", phone_number="9000000099",
+        )
+        call_command('export_users', format='jsonl', output=output, state_file=state_file, stderr=mock.MagicMock())
+        with open(output) as handle:
+            self.assertEqual([json.loads(line)['email'] for line in handle], ["late@example.com"])
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="Str0ng-pass-phrase", username="admin",
+            full_name="Admin", phone_number="9000000000",
+        )
+        for index in range(1, 4):
+            get_user_model().objects.create_user(
+                email=f"user{index}@example.com", password="Str0ng-pass-phrase", username=f"user{index}",
+                full_name=f"User {index}", phone_number=f"900000000{index}",
+            )
+
+    def test_changelist_skips_the_full_count_and_searches_substrings(self):
+        client = APIClient()
+        client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get('/admin/users/customeuser/', {'q': 'SER2@'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "user2@example.com")
+        self.assertNotContains(response, "user3@example.com")
+        counts = [query['sql'] for query in captured.captured_queries if 'COUNT(' in query['sql']]
+        self.assertEqual(len(counts), 1)
+        self.assertIn('LIMIT', counts[0])
+
+    def test_estimated_paginator_uses_an_estimate_for_unfiltered_tables(self):
+        from users import paginators
+
+        with mock.patch.object(paginators, 'ADMIN_EXACT_COUNT_LIMIT', 2):
+            paginator = paginators.EstimatedCountPaginator(get_user_model().objects.order_by('pk'), 2)
+            self.assertEqual(paginator.count, get_user_model().objects.order_by('-pk')[0].pk)
+            filtered = paginators.EstimatedCountPaginator(get_user_model().objects.filter(is_staff=False), 2)
+            self.assertEqual(filtered.count, 3)
+
+
+class DatabaseRoutingTests(TestCase):
+    def test_sqlite_connections_apply_the_configured_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], connection.settings_dict['OPTIONS']['timeout'] * 1000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_reads_use_a_replica_only_inside_replica_reads_and_before_any_write(self):
+        from users.db_router import PrimaryReplicaRouter
+        from users.utils import db_routing
+
+        router = PrimaryReplicaRouter()
+        User = get_user_model()
+        with mock.patch.object(db_routing, 'replica_aliases', return_value=['replica_0']):
+            tokens = db_routing.start_request()
+            try:
+                self.assertIsNone(router.db_for_read(User))
+                with db_routing.replica_reads():
+                    self.assertEqual(router.db_for_read(User), 'replica_0')
+                    self.assertEqual(router.db_for_write(User), 'default')
+                    self.assertIsNone(router.db_for_read(User))
+            finally:
+                db_routing.end_request(tokens)
+
+    def test_saving_a_user_keeps_their_reads_on_the_primary(self):
+        from users.utils import db_routing
+
+        user = get_user_model().objects.create_user(
+            email="fresh@example.com", password="Str0ng-pass-phrase", username="fresh",
+            full_name="Fresh", phone_number="9000000001",
+        )
+        self.assertTrue(db_routing.recently_written("fresh@example.com"))
+        self.assertTrue(db_routing.recently_written(user.pk))
+        self.assertFalse(db_routing.recently_written("other@example.com"))
+
+
+class EndpointBenchmarkTests(TestCase):
+    def test_mailboxlayer_stand_in_injects_latency_and_accepts_every_address(self):
+        from users.utils.stand_ins import MailboxlayerStub
+
+        stub = MailboxlayerStub(latency=0.05).start()
+        self.addCleanup(stub.stop)
+        email_validation.email_results.clear()
+        email_validation.domain_results.clear()
+        with mock.patch.object(email_validation, 'MAILBOXLAYER_URL', stub.url), \
+                mock.patch.dict('os.environ', {'MAILBOXLAYER_API_KEY': 'bench'}):
+            started = time.perf_counter()
+            self.assertTrue(email_validation.validate_email_with_mailboxlayer("someone@stub.example"))
+            self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+    def test_compare_flags_slower_p95_lower_throughput_and_new_errors(self):
+        from users.management.commands.bench_endpoints import Command
+
+        def result(rps, p95, errors=0):
+            return {'wsgi': {'requests_per_s': rps, 'endpoints': {'login': {'p95_ms': p95, 'errors': errors}}}}
+
+        command = Command(stdout=mock.MagicMock())
+        self.assertEqual(command.compare(result(100, 50), result(95, 55), 0.15), [])
+        self.assertEqual(len(command.compare(result(100, 50), result(80, 70, errors=1), 0.15)), 3)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class MetricsTests(TestCase):
+    def test_histogram_renders_cumulative_prometheus_buckets(self):
+        from users.metrics import Histogram, _registry
+
+        histogram = Histogram('test_latency_seconds', "Test.", ('view',), buckets=(0.1, 1.0))
+        self.addCleanup(_registry.remove, histogram)
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, 'login')
+        lines = list(histogram.collect())
+        self.assertIn('test_latency_seconds_bucket{view="login",le="0.1"} 1', lines)
+        self.assertIn('test_latency_seconds_bucket{view="login",le="1.0"} 3', lines)
+        self.assertIn('test_latency_seconds_bucket{view="login",le="+Inf"} 4', lines)
+        self.assertIn('test_latency_seconds_count{view="login"} 4', lines)
+
+    def test_requests_phases_and_otp_events_reach_the_metrics_endpoint(self):
+        from users.metrics import otp_events, phase_duration, request_duration
+
+        requests_before = request_duration.count('forgot-password', 'POST', 200)
+        db_before = phase_duration.count('forgot-password', 'db')
+        expired_before = otp_events.value('expired')
+
+        client = APIClient()
+        client.post('/api/users/forgot-password/', {'email': "nobody@example.com"}, format='json')
+        client.post('/api/users/verify-otp/', {'email': "nobody@example.com", 'otp': "123456"}, format='json')
+
+        self.assertEqual(request_duration.count('forgot-password', 'POST', 200), requests_before + 1)
+        self.assertGreater(phase_duration.count('forgot-password', 'db'), db_before)
+        self.assertEqual(otp_events.value('expired'), expired_before + 1)
+
+        with override_settings(METRICS_TOKEN="scrape-token"):
+            response = client.get('/metrics', HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(b'users_http_request_duration_seconds_count{view="forgot-password",method="POST",status="200"}', response.content)
+
+    def test_metrics_endpoint_requires_a_configured_token(self):
+        client = APIClient()
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(client.get('/metrics').status_code, 404)
+        with override_settings(METRICS_TOKEN="scrape-token"):
+            self.assertEqual(client.get('/metrics').status_code, 403)
+            self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+
+class StartupTests(TestCase):
+    def test_reset_tokens_are_signed_with_the_django_secret_key(self):
+        from users.utils.generate_reset_token import decode_reset_token, generate_reset_token
+
+        token = generate_reset_token(42)
+        self.assertEqual(decode_reset_token(token), 42)
+        with override_settings(SECRET_KEY="another-secret-key-for-this-test-only"):
+            self.assertIsNone(decode_reset_token(token))
+
+    def test_worker_boot_does_not_import_lazy_integrations(self):
+        from django.core.management import call_command
+
+        output = mock.MagicMock()
+        call_command('bench_startup', runs=1, top=0, stdout=output)
+        self.assertTrue(any("Startup within budget." in call.args[0] for call in output.write.call_args_list))
+
+
+class StubSmsProviderHandler(BaseHTTPRequestHandler):
+    messages = []
+    in_flight = 0
+    max_in_flight = 0
+    status_code = 201
+    delay = 0.0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(cls.delay)
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        with cls.lock:
+            cls.in_flight -= 1
+            cls.messages.append({key: values[0] for key, values in form.items()})
+        payload = json.dumps({'sid': "SM123", 'status': "queued"}).encode()
+        self.send_response(cls.status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class OTPChannelTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from http.server import ThreadingHTTPServer
+
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubSmsProviderHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/2010-04-01/Accounts/AC1/Messages.json"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        from users.utils import otp_channels
+
+        cache.clear()
+        StubSmsProviderHandler.messages = []
+        StubSmsProviderHandler.max_in_flight = 0
+        StubSmsProviderHandler.status_code = 201
+        StubSmsProviderHandler.delay = 0.0
+        for name, value in (('SMS_API_URL', self.url), ('SMS_FROM_NUMBER', "+15550000000")):
+            patcher = mock.patch.object(otp_channels, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_register_can_ask_for_an_sms_otp_with_email_fallback(self):
+        with mock.patch('users.views.validate_email_with_mailboxlayer', return_value=True):
+            response = APIClient().post('/api/users/register/', {
+                'email': "sms@example.com", 'password': "Str0ng-pass-phrase", 'confirm_password': "Str0ng-pass-phrase",
+                'full_name': "Sms User", 'phone_number': "9000000001", 'otp_channel': "sms",
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], "OTP sent to your phone.")
+        item = OTPOutbox.objects.get()
+        self.assertEqual((item.channel, item.recipient), ('sms', "9000000001"))
+        self.assertEqual((item.fallback_channel, item.fallback_recipient), ('email', "sms@example.com"))
+
+    def test_sms_batch_is_sent_concurrently_within_the_limit(self):
+        from users.utils import otp_channels
+
+        StubSmsProviderHandler.delay = 0.1
+        for index in range(6):
+            otp_outbox.enqueue_otp(f"u{index}@example.com", "subject", f"Your OTP is 10000{index}.",
+                                   phone_number=f"900000000{index}", channel='sms')
+
+        with mock.patch.object(otp_channels, 'SMS_MAX_CONCURRENCY', 2):
+            self.assertEqual(otp_outbox.drain_outbox(batch_size=10, max_workers=1), 6)
+
+        self.assertEqual(len(StubSmsProviderHandler.messages), 6)
+        self.assertEqual(StubSmsProviderHandler.max_in_flight, 2)
+        self.assertEqual(
+            sorted(message['To'] for message in StubSmsProviderHandler.messages),
+            [f"900000000{index}" for index in range(6)],
+        )
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_failed_sms_falls_back_to_email_immediately(self):
+        StubSmsProviderHandler.status_code = 500
+        item = otp_outbox.enqueue_otp("user@example.com", "subject", "Your OTP is 111111.",
+                                      phone_number="9000000001", channel='sms')
+
+        self.assertEqual(otp_outbox.drain_outbox(batch_size=10, max_workers=1), 0)
+        item.refresh_from_db()
+        self.assertEqual((item.channel, item.recipient, item.status), ('email', "user@example.com", 'pending'))
+
+        self.assertEqual(otp_outbox.drain_outbox(batch_size=10, max_workers=1), 1)
+        self.assertEqual(mail.outbox[0].to, ["user@example.com"])
+
+    def test_a_channel_that_keeps_failing_is_skipped_at_enqueue(self):
+        from users.utils import otp_channels
+
+        for _ in range(otp_channels.CHANNEL_FAILURE_THRESHOLD):
+            otp_channels.record_result('sms', False)
+
+        item = otp_outbox.enqueue_otp("user@example.com", "subject", "Your OTP is 111111.",
+                                      phone_number="9000000001", channel='sms')
+        self.assertEqual((item.channel, item.fallback_channel), ('email', 'sms'))
+
+        otp_channels.record_result('sms', True)
+        self.assertEqual(otp_channels.down_channels(), set())
+
+
+@override_settings(USER_CACHE_ENABLED=True)
+class ProfileETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="profile@example.com", password="Str0ng-pass-phrase", username="profile",
+            full_name="Profile User", phone_number="9000000001",
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_matching_if_none_match_gets_a_304_without_serializing(self):
+        first = self.client.get('/api/users/profile/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(first.content)['email'], "profile@example.com")
+        self.assertIn('Last-Modified', first)
+
+        with mock.patch('users.views.UserProfileSerializer') as serializer:
+            second = self.client.get('/api/users/profile/', HTTP_IF_NONE_MATCH=first['ETag'])
+            cached = self.client.get('/api/users/profile/')
+        serializer.assert_not_called()
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(cached.content, first.content)
+
+    def test_updates_change_the_etag_and_the_cached_body(self):
+        etag = self.client.get('/api/users/profile/')['ETag']
+
+        self.client.patch('/api/users/profile/', {'bio': "updated"}, format='json')
+
+        response = self.client.get('/api/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['bio'], "updated")
+
+    def test_write_that_skips_save_changes_the_etag_once_the_cache_expires(self):
+        from users.utils.user_cache import entry_key, profile_key
+
+        etag = self.client.get('/api/users/profile/')['ETag']
+        get_user_model().objects.filter(pk=self.user.pk).update(bio="changed elsewhere")
+        version = get_version(self.user.pk)
+        cache.delete_many([entry_key(self.user.pk, version), profile_key(self.user.pk, version)])  # TTL passed
+
+        response = self.client.get('/api/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['bio'], "changed elsewhere")
+
+    def test_profile_is_cached_under_the_version_the_user_was_loaded_at(self):
+        from users.authentication import CachedJWTAuthentication
+        from users.utils.user_cache import invalidate_user
+
+        get_user = CachedJWTAuthentication.get_user
+
+        def load_then_bump(auth, validated_token):
+            user = get_user(auth, validated_token)
+            invalidate_user(user.pk)  # a concurrent save lands after authentication
+            return user
+
+        loaded_at = get_version(self.user.pk)
+        with mock.patch.object(CachedJWTAuthentication, 'get_user', load_then_bump):
+            response = self.client.get('/api/users/profile/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(get_cached_profile(self.user.pk, loaded_at))
+        self.assertIsNone(get_cached_profile(self.user.pk, get_version(self.user.pk)))
+
+    def test_invalid_put_returns_400(self):
+        response = self.client.put('/api/users/profile/', {'full_name': ""}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DirtyFieldTrackingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="dirty@example.com", password="Str0ng-pass-phrase", username="dirty",
+            full_name="Dirty User", phone_number="9000000001", bio="bio", address="address",
+        )
+
+    def updates(self, captured):
+        return [sql for sql in statements(captured) if sql.startswith('UPDATE')]
+
+    def test_save_updates_only_the_changed_columns(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.bio = "new bio"
+        user.full_name = "Dirty User"  # unchanged value
+
+        with CaptureQueriesContext(connection) as captured:
+            user.save()
+
+        [sql] = self.updates(captured)
+        self.assertIn('SET "bio" = ', sql)
+        for column in ('"full_name"', '"address"', '"password"', '"email"'):
+            self.assertNotIn(column, sql)
+
+    def test_save_without_changes_issues_no_query(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            user.save()
+
+        user.bio = "changed"
+        user.save()
+        with self.assertNumQueries(0):
+            user.save()
+        user.refresh_from_db()
+        with self.assertNumQueries(0):
+            user.save()
+
+    def test_loading_a_deferred_field_keeps_pending_changes(self):
+        user = get_user_model().objects.defer('address').get(pk=self.user.pk)
+        user.bio = "changed"
+        self.assertEqual(user.address, "address")
+        self.assertEqual(user.get_dirty_fields(), ['bio'])
+
+        user.save()
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).bio, "changed")
+
+    def test_partial_refresh_keeps_changes_to_other_fields(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.bio = "changed"
+        user.full_name = "Local Edit"
+        user.refresh_from_db(fields=['full_name'])
+
+        self.assertEqual(user.full_name, "Dirty User")
+        self.assertEqual(user.get_dirty_fields(), ['bio'])
+
+    def test_explicit_update_fields_leave_other_changes_dirty(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.bio = "changed"
+        user.address = "changed"
+        user.save(update_fields=['bio'])
+        self.assertEqual(user.get_dirty_fields(), ['address'])
+
+    def test_profile_delete_and_password_reset_write_one_column(self):
+        from users.utils.generate_reset_token import generate_reset_token
+
+        client = APIClient()
+        with CaptureQueriesContext(connection) as captured:
+            client.post('/api/users/reset-password/', {
+                'token': generate_reset_token(self.user.pk), 'new_password': "An0ther-pass-phrase",
+            }, format='json')
+        [sql] = self.updates(captured)
+        self.assertRegex(sql, r'^UPDATE "users_customeuser" SET "password" = \S+ WHERE')
+
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(client.delete('/api/users/profile/').status_code, 204)
+        [sql] = self.updates(captured)
+        self.assertRegex(sql, r'^UPDATE "users_customeuser" SET "is_active" = \S+ WHERE')
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class AsyncViewTests(TestCase):
+    email = "async@example.com"
+    registration = {
+        'email': email, 'password': "Str0ng-pass-phrase", 'confirm_password': "Str0ng-pass-phrase",
+        'full_name': "Async User", 'phone_number': "9000000009",
+    }
+
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_user(
+            email="member@example.com", password="Str0ng-pass-phrase", username="member",
+            full_name="Member", phone_number="9000000008",
+        )
+        self.client = AsyncClient()
+        for target, value in (
+            ('users.async_views.avalidate_email_with_mailboxlayer', mock.AsyncMock(return_value=True)),
+            ('users.async_views.generate_otp', mock.Mock(return_value="123456")),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def post(self, path, data):
+        return await self.client.post(f'/api/users/async/{path}/', data, content_type='application/json')
+
+    async def verify(self, otp):
+        return await self.post('verify-otp', {'email': self.email, 'otp': otp})
+
+    async def test_register_verify_and_login(self):
+        response = await self.post('register', self.registration)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": "OTP sent to your email."})
+
+        response = await self.verify("123456")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await get_user_model().objects.filter(email=self.email).aexists())
+
+        response = await self.post('login', {'email': self.email, 'password': "Str0ng-pass-phrase"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh'})
+
+    async def test_wrong_otp_counts_an_attempt_until_the_limit(self):
+        await self.post('register', self.registration)
+
+        response = await self.verify("000000")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": f"Invalid OTP. Attempt 1/{otp_store.MAX_OTP_ATTEMPTS}"})
+
+        for _ in range(otp_store.MAX_OTP_ATTEMPTS - 2):
+            await self.verify("000000")
+        response = await self.verify("000000")
+        self.assertEqual(response.status_code, 403)
+
+        # The registration is gone, the right code no longer works either.
+        response = await self.verify("123456")
+        self.assertEqual(response.json(), {"error": "OTP expired or invalid."})
+        self.assertFalse(await get_user_model().objects.filter(email=self.email).aexists())
+
+    async def test_otp_without_a_pending_registration_is_expired(self):
+        response = await self.verify("123456")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "OTP expired or invalid."})
+
+    async def test_login_with_bad_credentials(self):
+        response = await self.post('login', {'email': "member@example.com", 'password': "wrong-password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["Invalid email or password."]})
+
+        response = await self.post('login', {'email': "nobody@example.com", 'password': "Str0ng-pass-phrase"})
+        self.assertEqual(response.status_code, 400)
+
+        response = await self.post('login', {'email': "member@example.com"})
+        self.assertEqual(response.json(), {"error": "Email and password are required."})
+
+    async def test_malformed_bodies_are_rejected(self):
+        for path in ('register', 'verify-otp', 'login'):
+            for body in ('[]', '[1]', '"text"', 'not json'):
+                with self.subTest(path=path, body=body):
+                    response = await self.post(path, body)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json(), {"error": "Invalid JSON body."})
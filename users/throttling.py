@@ -0,0 +1,147 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+RATE_PATTERN = re.compile(r'^(\d+)/(\d*)(s|sec|m|min|h|hour|d|day)$')
+PERIOD_SECONDS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    '10/min' -> (10, 60), '3/15min' -> (3, 900)
+    """
+    match = RATE_PATTERN.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '10/min' or '3/15min'.")
+    count, multiplier, period = match.groups()
+    return int(count), int(multiplier or 1) * PERIOD_SECONDS[period]
+
+
+def window_keys(key, window, now):
+    bucket = int(now // window)
+    return f"rl_{key}_{bucket}", f"rl_{key}_{bucket - 1}"
+
+
+def retry_after(current, previous, limit, window, now):
+    """
+    Seconds until the sliding-window estimate drops back under the limit.
+    """
+    elapsed = now % window
+    if current >= limit or not previous:
+        return max(1, int(window - elapsed) + 1)
+    # previous * (1 - t / window) + current < limit  <=>  t > window * (1 - (limit - current) / previous)
+    threshold = window * (1 - (limit - current) / previous)
+    return max(1, int(threshold - elapsed) + 1)
+
+
+def estimate(current, previous, window, now):
+    # Sliding-window counter: the previous fixed window counts in proportion to its overlap.
+    return previous * (1 - (now % window) / window) + current
+
+
+def hit(key, rate):
+    """
+    Count one request against `key`, return None if allowed or the seconds to wait.
+    Two cache round trips: an atomic incr of the current window and a read of the previous one.
+    """
+    limit, window = parse_rate(rate)
+    now = time.time()
+    current_key, previous_key = window_keys(key, window, now)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        current = 1 if cache.add(current_key, 1, timeout=window * 2) else cache.incr(current_key)
+    previous = cache.get(previous_key, 0)
+    if estimate(current, previous, window, now) > limit:
+        return retry_after(current, previous, limit, window, now)
+    return None
+
+
+async def ahit(key, rate):
+    limit, window = parse_rate(rate)
+    now = time.time()
+    current_key, previous_key = window_keys(key, window, now)
+    try:
+        current = await cache.aincr(current_key)
+    except ValueError:
+        current = 1 if await cache.aadd(current_key, 1, timeout=window * 2) else await cache.aincr(current_key)
+    previous = await cache.aget(previous_key, 0)
+    if estimate(current, previous, window, now) > limit:
+        return retry_after(current, previous, limit, window, now)
+    return None
+
+
+def client_ip(request):
+    """
+    The client address rate limits are keyed on, for sync and async views alike.
+    X-Forwarded-For is only read with NUM_PROXIES trusted proxies in front of the
+    app, taking the address the outermost of them saw; otherwise it is client
+    controlled and REMOTE_ADDR is used.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    num_proxies = api_settings.NUM_PROXIES or 0
+    if not num_proxies or not forwarded_for:
+        return remote_addr
+    addresses = forwarded_for.split(',')
+    return addresses[-min(num_proxies, len(addresses))].strip()
+
+
+def rate_limit_keys(scope, ip, data):
+    """
+    (key, rate) pairs of the RATE_LIMITS policy for `scope`, identified by IP, email and phone number.
+    """
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return []
+    policy = getattr(settings, 'RATE_LIMITS', {}).get(scope, {})
+    if not isinstance(data, dict) and not hasattr(data, 'get'):
+        data = {}
+    identities = {
+        'ip': ip,
+        'email': str(data.get('email') or '').strip().lower(),
+        'phone': str(data.get('phone_number') or '').strip(),
+    }
+    return [
+        (f"{scope}_{kind}_{identities[kind]}", rate)
+        for kind, rate in policy.items()
+        if identities.get(kind)
+    ]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Cache-backed sliding-window rate limit. The view's `throttle_scope` selects
+    the policy in settings.RATE_LIMITS, e.g. {'ip': '10/min', 'email': '3/15min'}.
+    Runs in APIView.initial(), before the handler does any expensive work.
+    """
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        self.wait_seconds = None
+        if not scope:
+            return True
+
+        for key, rate in rate_limit_keys(scope, client_ip(request), request.data):
+            wait = hit(key, rate)
+            if wait is not None:
+                self.wait_seconds = max(wait, self.wait_seconds or 0)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
+
+
+async def acheck_rate_limit(scope, request, data):
+    """
+    Async views: returns None if allowed, else the seconds to put in Retry-After.
+    """
+    wait_seconds = None
+    for key, rate in rate_limit_keys(scope, client_ip(request), data):
+        wait = await ahit(key, rate)
+        if wait is not None:
+            wait_seconds = max(wait, wait_seconds or 0)
+    return wait_seconds
@@ -0,0 +1,47 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.utils import token_buffer
+from users.utils.token_revocation import is_revoked, revoke
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist check is a cache lookup instead of a join on
+    the token_blacklist tables, when TOKEN_REVOCATION_CACHE allows it. Blacklisting
+    still writes the rows, and also marks the JTI as revoked in the cache.
+
+    With TOKEN_WRITE_BEHIND_ENABLED, for_user() hands the OutstandingToken row
+    to the write-behind buffer instead of inserting it during the login.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        if not token_buffer.WRITE_BEHIND_ENABLED:
+            return super().for_user(user)
+
+        # Token.for_user builds the claims, skipping BlacklistMixin's synchronous INSERT.
+        token = super(BlacklistMixin, cls).for_user(user)
+        token_buffer.outstanding_tokens.add(OutstandingToken(
+            user=user,
+            jti=token[api_settings.JTI_CLAIM],
+            token=str(token),
+            created_at=token.current_time,
+            expires_at=datetime_from_epoch(token["exp"]),
+        ))
+        return token
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        # Write buffered rows first so the blacklist entry points at the real row.
+        token_buffer.outstanding_tokens.flush()
+        result = super().blacklist()
+        revoke(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        return result
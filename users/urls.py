@@ -1,12 +1,19 @@
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
 from users.views import RegisterUserView, VerifyOTPView, LoginView, LogoutView
-from users.views import UserProfileAPIView, ResetPasswordView, ForgotPasswordView
+from users.views import UserProfileAPIView, ResetPasswordView, ForgotPasswordView, UserExportView
+from users.async_views import AsyncRegisterUserView, AsyncVerifyOTPView, AsyncLoginView
 urlpatterns = [
     path('register/', RegisterUserView.as_view(), name='register_user'),
     path('verify-otp/', VerifyOTPView.as_view(), name='verify_otp'),
     path('login/', LoginView.as_view(), name='login_user'),
     path('logout/', LogoutView.as_view(), name='logout_user'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', UserProfileAPIView.as_view(), name='profile'),
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
-    path('reset-password/', ResetPasswordView.as_view(), name='reset-password')
+    path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
+    path('export/', UserExportView.as_view(), name='export_users'),
+    path('async/register/', AsyncRegisterUserView.as_view(), name='async_register_user'),
+    path('async/verify-otp/', AsyncVerifyOTPView.as_view(), name='async_verify_otp'),
+    path('async/login/', AsyncLoginView.as_view(), name='async_login_user'),
 ]
@@ -0,0 +1,69 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_LAG_SECONDS = getattr(settings, 'DATABASE_REPLICA_LAG_SECONDS', 10)
+
+# Reads only go to a replica inside replica_reads(), and never once the current
+# request has written: from then on it is pinned to the primary.
+_replica_reads = ContextVar('db_replica_reads', default=False)
+_pinned = ContextVar('db_pinned_primary', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def pick_replica():
+    if _pinned.get() or not _replica_reads.get():
+        return None
+    aliases = replica_aliases()
+    return random.choice(aliases) if aliases else None
+
+
+def pin_primary():
+    _pinned.set(True)
+
+
+def start_request():
+    return _pinned.set(False), _replica_reads.set(False)
+
+
+def end_request(tokens):
+    pinned, replica_reads = tokens
+    _pinned.reset(pinned)
+    _replica_reads.reset(replica_reads)
+
+
+def written_key(ident):
+    return f"db_recent_write_{ident}"
+
+
+def mark_written(*idents):
+    """
+    Remember that these users changed, so reads about them skip the replicas
+    until replication has had time to catch up.
+    """
+    cache.set_many({written_key(ident): 1 for ident in idents if ident}, timeout=REPLICA_LAG_SECONDS)
+
+
+def recently_written(ident):
+    return cache.get(written_key(ident)) is not None
+
+
+@contextmanager
+def replica_reads(ident=None):
+    """
+    Send reads inside the block to a replica, unless `ident` was written recently.
+    """
+    if not replica_aliases() or (ident is not None and recently_written(ident)):
+        yield
+        return
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
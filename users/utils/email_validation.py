@@ -0,0 +1,238 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+
+from users.metrics import timed
+
+MAILBOXLAYER_URL = getattr(settings, 'MAILBOXLAYER_URL', 'http://apilayer.net/api/check')
+MAILBOXLAYER_TIMEOUT = getattr(settings, 'MAILBOXLAYER_TIMEOUT', (2, 5))
+MAILBOXLAYER_FAIL_OPEN = getattr(settings, 'MAILBOXLAYER_FAIL_OPEN', True)
+MAILBOXLAYER_CACHE_TTL = getattr(settings, 'MAILBOXLAYER_CACHE_TTL', 3600)
+MAILBOXLAYER_CACHE_SIZE = getattr(settings, 'MAILBOXLAYER_CACHE_SIZE', 10000)
+MAILBOXLAYER_BREAKER_THRESHOLD = getattr(settings, 'MAILBOXLAYER_BREAKER_THRESHOLD', 5)
+MAILBOXLAYER_BREAKER_RESET_SECONDS = getattr(settings, 'MAILBOXLAYER_BREAKER_RESET_SECONDS', 30)
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for `reset_timeout` seconds after
+    `failure_threshold` consecutive failures, then lets one trial call through.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Half-open: a single probe goes through, everyone else keeps getting the
+            # fallback until it reports back. A probe that never does (the caller
+            # died) is replaced after another reset_timeout.
+            if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+                return False
+            self.probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_started_at = None
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+email_results = TTLCache(MAILBOXLAYER_CACHE_SIZE, MAILBOXLAYER_CACHE_TTL)
+domain_results = TTLCache(MAILBOXLAYER_CACHE_SIZE, MAILBOXLAYER_CACHE_TTL)
+breaker = CircuitBreaker(MAILBOXLAYER_BREAKER_THRESHOLD, MAILBOXLAYER_BREAKER_RESET_SECONDS)
+
+_session = None
+_session_lock = threading.Lock()
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    """
+    Shared HTTP session so the connection to mailboxlayer is kept alive between registrations.
+    """
+    global _session
+    if _session is None:
+        # requests is only imported once a registration needs the validator.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=20)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_domain(email):
+    return email.rsplit('@', 1)[-1].lower()
+
+
+def cache_result(email, result):
+    """
+    Cache the verdict for the address, and for the whole domain when the verdict
+    does not depend on the mailbox (no MX record, or a catch-all domain).
+    """
+    deliverable = bool(result.get('smtp_check'))
+    email_results.set(email.lower(), deliverable)
+    if result.get('mx_found') is False:
+        domain_results.set(get_domain(email), False)
+    elif result.get('catch_all') and deliverable:
+        domain_results.set(get_domain(email), True)
+    return deliverable
+
+
+def get_api_key():
+    api_key = os.getenv('MAILBOXLAYER_API_KEY')
+    if not api_key:
+        raise ValueError("Mailbox Layer API keyv not found in environment variables, please set it up.")
+    return api_key
+
+
+def cached_verdict(email):
+    cached = email_results.get(email.lower())
+    if cached is None:
+        cached = domain_results.get(get_domain(email))
+    return cached
+
+
+def handle_result(email, result):
+    if 'error' in result:
+        # Quota or key problems, treat like an outage and don't cache the verdict.
+        breaker.record_failure()
+        return MAILBOXLAYER_FAIL_OPEN
+
+    breaker.record_success()
+    return cache_result(email, result)
+
+
+@timed('mailboxlayer')
+def validate_email_with_mailboxlayer(email):
+    """
+    validate email is abel to recieve email or not using mailboxlayer API
+    """
+
+    cached = cached_verdict(email)
+    if cached is not None:
+        return cached
+
+    params = {'access_key': get_api_key(), 'email': email, 'smtp': 1, 'format': 1}
+    if not breaker.allow_request():
+        return MAILBOXLAYER_FAIL_OPEN
+
+    import requests
+
+    try:
+        response = get_session().get(MAILBOXLAYER_URL, params=params, timeout=MAILBOXLAYER_TIMEOUT)
+        response.raise_for_status()
+        result = response.json()
+    except (requests.RequestException, ValueError):
+        breaker.record_failure()
+        return MAILBOXLAYER_FAIL_OPEN
+
+    return handle_result(email, result)
+
+
+def get_async_session():
+    """
+    One aiohttp session per event loop, sessions can't be shared between loops.
+    """
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connect_timeout, read_timeout = MAILBOXLAYER_TIMEOUT
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100),
+            timeout=aiohttp.ClientTimeout(total=connect_timeout + read_timeout, connect=connect_timeout),
+        )
+        _async_sessions[loop] = session
+    return session
+
+
+@timed('mailboxlayer')
+async def avalidate_email_with_mailboxlayer(email):
+    """
+    Async version of validate_email_with_mailboxlayer, shares its caches and circuit breaker.
+    """
+    import aiohttp
+
+    cached = cached_verdict(email)
+    if cached is not None:
+        return cached
+
+    params = {'access_key': get_api_key(), 'email': email, 'smtp': 1, 'format': 1}
+    if not breaker.allow_request():
+        return MAILBOXLAYER_FAIL_OPEN
+
+    try:
+        async with get_async_session().get(MAILBOXLAYER_URL, params=params) as response:
+            response.raise_for_status()
+            result = await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        breaker.record_failure()
+        return MAILBOXLAYER_FAIL_OPEN
+
+    return handle_result(email, result)
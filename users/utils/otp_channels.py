@@ -0,0 +1,140 @@
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+
+OTP_CHANNELS = ('email', 'sms')
+OTP_DEFAULT_CHANNEL = getattr(settings, 'OTP_DEFAULT_CHANNEL', 'email')
+CHANNEL_FAILURE_THRESHOLD = getattr(settings, 'OTP_CHANNEL_FAILURE_THRESHOLD', 5)
+CHANNEL_DOWN_SECONDS = getattr(settings, 'OTP_CHANNEL_DOWN_SECONDS', 60)
+
+SMS_ACCOUNT_SID = getattr(settings, 'SMS_ACCOUNT_SID', '')
+SMS_AUTH_TOKEN = getattr(settings, 'SMS_AUTH_TOKEN', '')
+SMS_FROM_NUMBER = getattr(settings, 'SMS_FROM_NUMBER', '')
+SMS_API_URL = getattr(settings, 'SMS_API_URL', '') or (
+    f"https://api.twilio.com/2010-04-01/Accounts/{SMS_ACCOUNT_SID}/Messages.json"
+)
+SMS_MAX_CONCURRENCY = getattr(settings, 'SMS_MAX_CONCURRENCY', 10)
+SMS_TIMEOUT = getattr(settings, 'SMS_TIMEOUT', 5)
+
+# Channel health is shared through the cache, because OTPs are queued by the web
+# workers but delivered by the outbox workers:
+#   otp_channel_failures_<channel>  consecutive delivery failures
+#   otp_channel_down_<channel>      set for CHANNEL_DOWN_SECONDS once that reaches the threshold
+
+
+def failures_key(channel):
+    return f"otp_channel_failures_{channel}"
+
+
+def down_key(channel):
+    return f"otp_channel_down_{channel}"
+
+
+def record_result(channel, ok):
+    if ok:
+        cache.delete_many([failures_key(channel), down_key(channel)])
+        return
+    try:
+        failures = cache.incr(failures_key(channel))
+    except ValueError:
+        cache.add(failures_key(channel), 0, timeout=CHANNEL_DOWN_SECONDS)
+        failures = cache.incr(failures_key(channel))
+    if failures >= CHANNEL_FAILURE_THRESHOLD:
+        cache.set(down_key(channel), 1, timeout=CHANNEL_DOWN_SECONDS)
+
+
+def down_channels():
+    return set(cache.get_many([down_key(channel) for channel in OTP_CHANNELS]))
+
+
+async def adown_channels():
+    return set(await cache.aget_many([down_key(channel) for channel in OTP_CHANNELS]))
+
+
+def plan_delivery(channel, email, phone_number, down=frozenset()):
+    """
+    Pick (channel, recipient, fallback_channel, fallback_recipient) for an OTP.
+    The requested channel is used unless it is marked down and the other one
+    is not; the other channel is kept as the fallback when it has a recipient.
+    """
+    recipients = {'email': email or '', 'sms': phone_number or ''}
+    primary = channel or OTP_DEFAULT_CHANNEL
+    fallback = next(name for name in OTP_CHANNELS if name != primary)
+    if not recipients[fallback]:
+        fallback = ''
+    if fallback and down_key(primary) in down and down_key(fallback) not in down:
+        primary, fallback = fallback, primary
+    return primary, recipients[primary], fallback, recipients.get(fallback, '')
+
+
+class EmailChannel:
+    """
+    Sends a batch over one connection of the configured email backend.
+    """
+    name = 'email'
+
+    def send_batch(self, items):
+        errors = [None] * len(items)
+        done = 0
+        try:
+            with get_connection(fail_silently=False) as email_connection:
+                for index, item in enumerate(items):
+                    try:
+                        EmailMessage(
+                            subject=item.subject,
+                            body=item.message,
+                            from_email=settings.DEFAULT_FROM_EMAIL,
+                            to=[item.recipient],
+                            connection=email_connection,
+                        ).send()
+                    except Exception as e:
+                        errors[index] = e
+                    done = index + 1
+        except Exception as e:
+            # The connection itself failed, every message not tried yet is retried.
+            for index in range(done, len(items)):
+                errors[index] = e
+        return errors
+
+
+class SmsChannel:
+    """
+    Sends a batch concurrently through a Twilio-style HTTP API (form POST of
+    To / From / Body with basic auth), over one pooled aiohttp session with at
+    most SMS_MAX_CONCURRENCY requests in flight. A request slower than
+    SMS_TIMEOUT counts as a failure.
+    """
+    name = 'sms'
+
+    def send_batch(self, items):
+        return asyncio.run(self.asend_batch(items))
+
+    async def asend_batch(self, items):
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(SMS_MAX_CONCURRENCY)
+        auth = aiohttp.BasicAuth(SMS_ACCOUNT_SID, SMS_AUTH_TOKEN) if SMS_ACCOUNT_SID else None
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=SMS_MAX_CONCURRENCY),
+            timeout=aiohttp.ClientTimeout(total=SMS_TIMEOUT),
+            auth=auth,
+        ) as session:
+            return await asyncio.gather(*(self.send(session, semaphore, item) for item in items))
+
+    async def send(self, session, semaphore, item):
+        import aiohttp
+
+        async with semaphore:
+            try:
+                payload = {'To': item.recipient, 'From': SMS_FROM_NUMBER, 'Body': item.message}
+                async with session.post(SMS_API_URL, data=payload) as response:
+                    if response.status >= 300:
+                        return RuntimeError(f"SMS provider returned {response.status}: {(await response.text())[:200]}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return RuntimeError(f"SMS request failed: {e!r}")
+        return None
+
+
+CHANNELS = {channel.name: channel for channel in (EmailChannel(), SmsChannel())}
@@ -0,0 +1,177 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from users.metrics import otp_events, timed
+from users.models import OTPOutbox
+from users.utils.otp_channels import CHANNELS, adown_channels, down_channels, plan_delivery, record_result
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OTP_OUTBOX_MAX_ATTEMPTS', 5)
+OUTBOX_BACKOFF_SECONDS = getattr(settings, 'OTP_OUTBOX_BACKOFF_SECONDS', 2)
+OUTBOX_MAX_BACKOFF_SECONDS = getattr(settings, 'OTP_OUTBOX_MAX_BACKOFF_SECONDS', 300)
+OUTBOX_VISIBILITY_TIMEOUT = getattr(settings, 'OTP_OUTBOX_VISIBILITY_TIMEOUT', 60)
+
+
+def enqueue_otp(email, subject, message, phone_number=None, channel=None):
+    """
+    Put an OTP in the outbox on `channel` ('email' or 'sms', OTP_DEFAULT_CHANNEL
+    by default), with the other channel as fallback when there is a recipient
+    for it. The workers deliver it later.
+    """
+    channel, recipient, fallback_channel, fallback_recipient = plan_delivery(
+        channel, email, phone_number, down_channels(),
+    )
+    item = OTPOutbox.objects.create(
+        channel=channel, recipient=recipient,
+        fallback_channel=fallback_channel, fallback_recipient=fallback_recipient,
+        subject=subject, message=message,
+    )
+    otp_events.inc('queued')
+    return item
+
+
+@timed('otp_send')
+async def aenqueue_otp(email, subject, message, phone_number=None, channel=None):
+    channel, recipient, fallback_channel, fallback_recipient = plan_delivery(
+        channel, email, phone_number, await adown_channels(),
+    )
+    item = await OTPOutbox.objects.acreate(
+        channel=channel, recipient=recipient,
+        fallback_channel=fallback_channel, fallback_recipient=fallback_recipient,
+        subject=subject, message=message,
+    )
+    otp_events.inc('queued')
+    return item
+
+
+def backoff_delay(attempts):
+    """
+    Exponential backoff (in seconds) before the next delivery attempt.
+    """
+    return min(OUTBOX_BACKOFF_SECONDS * (2 ** (attempts - 1)), OUTBOX_MAX_BACKOFF_SECONDS)
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to `batch_size` due messages.
+
+    A message is claimed with a conditional UPDATE so two workers never pick the
+    same row. Claimed rows become visible again after OUTBOX_VISIBILITY_TIMEOUT
+    in case the worker that claimed them dies mid-send.
+    """
+    now = timezone.now()
+    candidates = (
+        OTPOutbox.objects
+        .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values_list('id', 'status', 'next_attempt_at')[:batch_size]
+    )
+
+    claimed = []
+    lease_until = now + timedelta(seconds=OUTBOX_VISIBILITY_TIMEOUT)
+    for pk, current_status, next_attempt_at in candidates:
+        updated = OTPOutbox.objects.filter(
+            pk=pk, status=current_status, next_attempt_at=next_attempt_at
+        ).update(status='sending', next_attempt_at=lease_until)
+        if updated:
+            claimed.append(pk)
+    return list(OTPOutbox.objects.filter(pk__in=claimed))
+
+
+def deliver(messages):
+    """
+    Send a list of outbox rows, one batch per channel, and record the result of each.
+    """
+    if not messages:
+        return 0
+
+    by_channel = defaultdict(list)
+    for item in messages:
+        by_channel[item.channel].append(item)
+
+    sent = 0
+    for channel, items in by_channel.items():
+        errors = CHANNELS[channel].send_batch(items)
+        for item, error in zip(items, errors):
+            record_result(channel, error is None)
+            if error is None:
+                mark_sent(item)
+                sent += 1
+            else:
+                mark_failed(item, error)
+    return sent
+
+
+def deliver_in_worker(messages):
+    """
+    Worker thread entry point, closes the thread's own DB connection when done.
+    """
+    try:
+        return deliver(messages)
+    finally:
+        connection.close()
+
+
+# Rows in a terminal state keep their metadata but not the message: it holds
+# the plaintext OTP, which is no longer needed once delivery is over.
+
+def mark_sent(item):
+    item.status = 'sent'
+    item.attempts += 1
+    item.sent_at = timezone.now()
+    item.last_error = ''
+    item.message = ''
+    item.save(update_fields=['status', 'attempts', 'sent_at', 'last_error', 'message'])
+    otp_events.inc('sent')
+
+
+def mark_failed(item, error):
+    item.attempts += 1
+    item.last_error = str(error)
+    if item.fallback_channel:
+        # Switch channels right away instead of backing off on a slow or failing one.
+        otp_events.inc('fallback')
+        item.channel, item.recipient = item.fallback_channel, item.fallback_recipient
+        item.fallback_channel = item.fallback_recipient = ''
+        item.status = 'pending'
+        item.next_attempt_at = timezone.now()
+        item.save(update_fields=[
+            'channel', 'recipient', 'fallback_channel', 'fallback_recipient',
+            'status', 'attempts', 'last_error', 'next_attempt_at',
+        ])
+        return
+    if item.attempts >= OUTBOX_MAX_ATTEMPTS:
+        item.status = 'failed'
+        item.message = ''
+        otp_events.inc('failed')
+        logger.error("Giving up on OTP %s to %s after %s attempts: %s", item.channel, item.recipient, item.attempts, error)
+    else:
+        item.status = 'pending'
+        otp_events.inc('retried')
+        item.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(item.attempts))
+    item.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'message'])
+
+
+def drain_outbox(batch_size=100, max_workers=4):
+    """
+    Claim one batch of due messages and deliver it with at most `max_workers` concurrent senders.
+    Returns the number of messages that were sent.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0
+
+    chunks = [messages[i::max_workers] for i in range(max_workers)]
+    chunks = [chunk for chunk in chunks if chunk]
+    if len(chunks) == 1:
+        return deliver(chunks[0])
+
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        return sum(pool.map(deliver_in_worker, chunks))
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+
+from users.metrics import timed
+
+OTP_EXPIRY_SECONDS = 600 # 10 minutes
+MAX_OTP_ATTEMPTS = 3
+
+# Cache layout of a pending registration, all three keys share the OTP expiry:
+#   temp_user_data_<email>  registration payload, only read once the OTP matches
+#   otp_<email>             the OTP (not stored when OTPs are derived, see stateless_otp)
+#   otp_attempts_<email>    failed attempts, updated with atomic cache.incr
+
+
+def data_key(email):
+    return f"temp_user_data_{email}"
+
+
+def otp_key(email):
+    return f"otp_{email}"
+
+
+def attempts_key(email):
+    return f"otp_attempts_{email}"
+
+
+def pending_keys(email):
+    return [data_key(email), otp_key(email), attempts_key(email)]
+
+
+def pending_values(email, data, otp):
+    values = {data_key(email): data, attempts_key(email): 0}
+    if otp is not None:
+        values[otp_key(email)] = otp
+    return values
+
+
+@timed('cache')
+def store_pending(email, data, otp):
+    cache.set_many(pending_values(email, data, otp), timeout=OTP_EXPIRY_SECONDS)
+
+
+@timed('cache')
+def get_otp_state(email):
+    """
+    Return (otp, attempts) in one round trip, otp is None once expired or cleared.
+    """
+    state = cache.get_many([otp_key(email), attempts_key(email)])
+    return state.get(otp_key(email)), state.get(attempts_key(email), 0)
+
+
+@timed('cache')
+def record_failed_attempt(email):
+    """
+    Atomically count a wrong guess, returns None if the pending registration is already gone.
+    """
+    try:
+        return cache.incr(attempts_key(email))
+    except ValueError:
+        return None
+
+
+@timed('cache')
+def get_pending_data(email):
+    return cache.get(data_key(email))
+
+
+@timed('cache')
+def get_attempts_and_data(email):
+    """
+    Return (attempts, data) in one round trip, used once a derived OTP matched.
+    """
+    state = cache.get_many([attempts_key(email), data_key(email)])
+    return state.get(attempts_key(email), 0), state.get(data_key(email))
+
+
+@timed('cache')
+def clear_pending(email):
+    cache.delete_many(pending_keys(email))
+
+
+@timed('cache')
+async def astore_pending(email, data, otp):
+    await cache.aset_many(pending_values(email, data, otp), timeout=OTP_EXPIRY_SECONDS)
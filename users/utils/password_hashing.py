@@ -0,0 +1,69 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+from users.metrics import timed
+
+HASH_EXECUTOR = getattr(settings, 'PASSWORD_HASH_EXECUTOR', 'thread')
+HASH_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', 4)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_process_worker():
+    import django
+
+    django.setup()
+
+
+def get_executor():
+    """
+    Bounded pool password hashing runs in, so hashing never runs on the event loop
+    and at most HASH_WORKERS hashes are computed at once.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if HASH_EXECUTOR == 'process':
+                    _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, initializer=_init_process_worker)
+                else:
+                    _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+    return _executor
+
+
+def needs_rehash(encoded):
+    """
+    True when the hash was made by another hasher or with other cost settings than the current policy.
+    """
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher()
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+@timed('hashing')
+async def run_in_hash_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+async def amake_password(password):
+    return await run_in_hash_pool(make_password, password)
+
+
+async def acheck_password(user, password):
+    """
+    Async user.check_password(): verifies in the hash pool and rehashes with the
+    current policy after a successful check, like Django does on login.
+    """
+    is_correct = await run_in_hash_pool(check_password, password, user.password)
+    if is_correct and needs_rehash(user.password):
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import struct
+import time
+
+from django.conf import settings
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
+
+from users.metrics import timed
+
+RECORD_VERSION = 1
+_HEADER = struct.Struct('>BI')  # record version, expiry as epoch seconds
+_LENGTH = struct.Struct('>H')
+OTP_HASH_SIZE = 16
+
+
+def hash_otp(email, otp):
+    """
+    Keyed hash of the OTP, so the code itself is never stored in the cache.
+    """
+    message = f"{email.lower()}:{otp}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()[:OTP_HASH_SIZE]
+
+
+def otp_matches(email, otp, otp_hash):
+    if not otp or not otp_hash:
+        return False
+    return hmac.compare_digest(hash_otp(email, str(otp)), otp_hash)
+
+
+class PendingRegistration:
+    """
+    What we keep of a registration until its OTP is verified.
+
+    The password is hashed once at registration and `confirm_password` is
+    dropped, so verification only has to insert the row. Records are encoded
+    with `encode()` into a compact binary form for the cache.
+    """
+    __slots__ = ('email', 'full_name', 'phone_number', 'password_hash', 'expires_at')
+
+    def __init__(self, email, full_name, phone_number, password_hash, expires_at):
+        self.email = email
+        self.full_name = full_name
+        self.phone_number = phone_number
+        self.password_hash = password_hash
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_validated_data(cls, data, expiry_seconds, password_hash=None):
+        if password_hash is None:
+            with timed('hashing'):
+                password_hash = make_password(data['password'])
+        return cls(
+            email=BaseUserManager.normalize_email(data['email']),
+            full_name=data['full_name'],
+            phone_number=data['phone_number'],
+            password_hash=password_hash,
+            expires_at=int(time.time()) + expiry_seconds,
+        )
+
+    def is_expired(self):
+        return self.expires_at <= time.time()
+
+    def user_fields(self):
+        return {
+            'email': self.email,
+            'full_name': self.full_name,
+            'phone_number': self.phone_number,
+            'password': self.password_hash,
+        }
+
+    def encode(self):
+        parts = [_HEADER.pack(RECORD_VERSION, self.expires_at)]
+        for value in (self.email, self.full_name, self.phone_number, self.password_hash):
+            raw = value.encode()
+            parts.append(_LENGTH.pack(len(raw)))
+            parts.append(raw)
+        return b''.join(parts)
+
+    @classmethod
+    def decode(cls, raw):
+        version, expires_at = _HEADER.unpack_from(raw)
+        if version != RECORD_VERSION:
+            raise ValueError(f"Unknown pending registration record version {version}.")
+        offset = _HEADER.size
+        values = []
+        for _ in range(4):
+            (length,) = _LENGTH.unpack_from(raw, offset)
+            offset += _LENGTH.size
+            values.append(raw[offset:offset + length].decode())
+            offset += length
+        email, full_name, phone_number, password_hash = values
+        return cls(email, full_name, phone_number, password_hash, expires_at)
@@ -0,0 +1,117 @@
+import smtplib
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+POOL_SIZE = getattr(settings, 'EMAIL_POOL_SIZE', 4)
+POOL_IDLE_TIMEOUT = getattr(settings, 'EMAIL_POOL_IDLE_TIMEOUT', 30)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _quit(smtp_connection):
+    try:
+        smtp_connection.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp_connection.close()
+
+
+class SMTPConnectionPool:
+    """
+    Keeps a few authenticated SMTP sessions alive so they can be reused between sends.
+    Sessions idle for longer than `idle_timeout` seconds are closed instead of reused.
+    """
+
+    def __init__(self, max_size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                smtp_connection, released_at = self._idle.pop()
+            if time.monotonic() - released_at <= self.idle_timeout:
+                return smtp_connection
+            _quit(smtp_connection)
+
+    def release(self, smtp_connection):
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((smtp_connection, time.monotonic()))
+                return
+        _quit(smtp_connection)
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for smtp_connection, _ in idle:
+            _quit(smtp_connection)
+
+
+def get_pool(key):
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SMTPConnectionPool()
+        return _pools[key]
+
+
+class PooledSMTPEmailBackend(EmailBackend):
+    """
+    SMTP backend that borrows sessions from a per-process pool instead of doing
+    a connect / STARTTLS / AUTH handshake for every message. A session that was
+    dropped by the server is reopened once and the message is retried.
+    """
+
+    @property
+    def pool(self):
+        return get_pool((self.host, self.port, self.username, self.use_tls, self.use_ssl))
+
+    def open(self):
+        if self.connection:
+            return False
+        pooled = self.pool.acquire()
+        if pooled is not None:
+            self.connection = pooled
+            return True
+        return super().open()
+
+    def close(self):
+        if self.connection is None:
+            return
+        smtp_connection, self.connection = self.connection, None
+        self.pool.release(smtp_connection)
+
+    def reconnect(self):
+        if self.connection is not None:
+            smtp_connection, self.connection = self.connection, None
+            smtp_connection.close()
+        return super().open()
+
+    def _send(self, email_message):
+        fail_silently, self.fail_silently = self.fail_silently, False
+        try:
+            if self.connection is None:
+                super().open()
+            try:
+                return super()._send(email_message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.reconnect()
+                return super()._send(email_message)
+        except (smtplib.SMTPException, OSError):
+            if self.connection is not None:
+                # Don't hand a session in an unknown state back to the pool.
+                smtp_connection, self.connection = self.connection, None
+                smtp_connection.close()
+            if not fail_silently:
+                raise
+            return False
+        finally:
+            self.fail_silently = fail_silently
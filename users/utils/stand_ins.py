@@ -0,0 +1,62 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+
+# Local replacements for the external services, used by the benchmarks so a run
+# measures this code plus a known, injected latency instead of a third party.
+
+
+class MailboxlayerStub:
+    """
+    Threaded HTTP server answering like the mailboxlayer check API after
+    `latency` seconds. Every address is deliverable.
+    """
+
+    def __init__(self, latency=0.0, port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                email = parse_qs(urlparse(self.path).query).get('email', [''])[0]
+                time.sleep(stub.latency)
+                body = json.dumps({
+                    'email': email, 'format_valid': True, 'mx_found': True,
+                    'smtp_check': True, 'disposable': False, 'score': 0.96,
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/check"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LatencyEmailBackend(LocMemEmailBackend):
+    """
+    In-memory email backend that waits `latency` seconds per message, standing
+    in for the SMTP provider.
+    """
+    latency = 0.0
+
+    def send_messages(self, messages):
+        time.sleep(self.latency * len(messages or []))
+        return super().send_messages(messages)
@@ -0,0 +1,49 @@
+import base64
+import hashlib
+import hmac
+import time
+
+from django.conf import settings
+
+from users.utils.otp_store import OTP_EXPIRY_SECONDS
+
+# 'stored': a random OTP, its keyed hash kept in the cache (otp_<email>).
+# 'stateless': the OTP is derived from SECRET_KEY, the email and the current
+# time step (TOTP), nothing but the attempt counter and the pending record is stored.
+OTP_MODE = getattr(settings, 'OTP_MODE', 'stored')
+OTP_TIME_STEP = getattr(settings, 'OTP_TIME_STEP', 60)
+
+
+def is_stateless():
+    return OTP_MODE == 'stateless'
+
+
+def otp_secret(email):
+    digest = hmac.new(settings.SECRET_KEY.encode(), f"otp:{email.lower()}".encode(), hashlib.sha256).digest()
+    return base64.b32encode(digest).decode()
+
+
+def get_totp(email):
+    import pyotp
+
+    return pyotp.TOTP(otp_secret(email), digits=6, interval=OTP_TIME_STEP)
+
+
+def derive_otp(email, for_time=None):
+    return get_totp(email).at(for_time if for_time is not None else time.time())
+
+
+def verify_derived_otp(email, otp, for_time=None):
+    """
+    True if `otp` was derived for this email within the last OTP_EXPIRY_SECONDS.
+    Only past time steps are accepted, never future ones.
+    """
+    if not email or not otp:
+        return False
+    totp = get_totp(email)
+    now = for_time if for_time is not None else time.time()
+    otp = str(otp)
+    return any(
+        hmac.compare_digest(totp.at(now, -offset), otp)
+        for offset in range(OTP_EXPIRY_SECONDS // OTP_TIME_STEP + 1)
+    )
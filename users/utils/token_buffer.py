@@ -0,0 +1,64 @@
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import connection
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+WRITE_BEHIND_ENABLED = getattr(settings, 'TOKEN_WRITE_BEHIND_ENABLED', False)
+WRITE_BEHIND_MAX_BATCH = getattr(settings, 'TOKEN_WRITE_BEHIND_MAX_BATCH', 100)
+WRITE_BEHIND_MAX_DELAY = getattr(settings, 'TOKEN_WRITE_BEHIND_MAX_DELAY', 1.0)
+
+
+class OutstandingTokenBuffer:
+    """
+    Collects OutstandingToken rows issued at login and writes them with one
+    bulk_create once `max_batch` rows are waiting or the oldest one has waited
+    `max_delay` seconds, whichever comes first.
+
+    Rows still in the buffer when the process dies are lost. The tokens stay
+    valid and can still be blacklisted (blacklist() creates the missing row),
+    they are only missing from the outstanding tokens table.
+    """
+
+    def __init__(self, max_batch=WRITE_BEHIND_MAX_BATCH, max_delay=WRITE_BEHIND_MAX_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._rows = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, row):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_batch
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if rows:
+            # A token blacklisted before its flush already has its row, keep that one.
+            OutstandingToken.objects.bulk_create(rows, ignore_conflicts=True)
+        return len(rows)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def __len__(self):
+        return len(self._rows)
+
+
+outstanding_tokens = OutstandingTokenBuffer()
+atexit.register(outstanding_tokens.flush)
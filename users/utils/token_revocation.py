@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+REVOCATION_RELOAD_SECONDS = getattr(settings, 'TOKEN_REVOCATION_RELOAD_SECONDS', 3600)
+LOADED_KEY = "revoked_jti_loaded"
+READY_KEY = "revoked_jti_ready"
+RELOAD_LOCK_KEY = "revoked_jti_reload_lock"
+RELOAD_LOCK_SECONDS = 300
+
+# Every revoked refresh token has a revoked_jti_<jti> cache entry that expires
+# together with the token. The BlacklistedToken table stays the source of truth:
+# the set is (re)loaded from it when the LOADED_KEY marker is missing. Only the
+# caller that takes RELOAD_LOCK_KEY reloads; the others keep using the current
+# set, or ask the table while there is none yet (READY_KEY missing).
+#
+# A missing entry reads as "not revoked", so the cache is only trusted when it is
+# shared by every worker and never evicts (TOKEN_REVOCATION_CACHE, see settings).
+# Otherwise a revocation made by one worker, or an evicted entry, would let the
+# token be refreshed again; is_revoked then asks the blacklist table instead.
+
+
+def revoked_key(jti):
+    return f"revoked_jti_{jti}"
+
+
+def seconds_left(exp):
+    return max(int(exp - time.time()), 1)
+
+
+def revoke(jti, exp):
+    """
+    Mark a refresh token as revoked until it expires, `exp` is the token's epoch expiry.
+    """
+    cache.set(revoked_key(jti), 1, timeout=seconds_left(exp))
+
+
+def load_revoked(chunk_size=5000):
+    """
+    Copy every blacklisted, not yet expired token into the cache.
+    """
+    tokens = (
+        BlacklistedToken.objects
+        .filter(token__expires_at__gt=timezone.now())
+        .values_list('token__jti', 'token__expires_at')
+        .iterator(chunk_size=chunk_size)
+    )
+    batch = []
+    for jti, expires_at in tokens:
+        batch.append((jti, expires_at.timestamp()))
+        if len(batch) >= chunk_size:
+            _store(batch)
+            batch = []
+    _store(batch)
+    cache.set(READY_KEY, 1, timeout=None)
+    cache.set(LOADED_KEY, 1, timeout=REVOCATION_RELOAD_SECONDS)
+
+
+def _store(batch):
+    # set_many takes one timeout, tokens expiring within the same minute share one call.
+    by_timeout = {}
+    for jti, exp in batch:
+        by_timeout.setdefault(seconds_left(exp) // 60 * 60 + 60, {})[revoked_key(jti)] = 1
+    for timeout, entries in by_timeout.items():
+        cache.set_many(entries, timeout=timeout)
+
+
+def is_revoked(jti):
+    if not settings.TOKEN_REVOCATION_CACHE:
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+    state = cache.get_many([LOADED_KEY, READY_KEY])
+    if LOADED_KEY not in state:
+        if cache.add(RELOAD_LOCK_KEY, 1, timeout=RELOAD_LOCK_SECONDS):
+            try:
+                load_revoked()
+            finally:
+                cache.delete(RELOAD_LOCK_KEY)
+        elif READY_KEY not in state:
+            return BlacklistedToken.objects.filter(token__jti=jti).exists()
+    return cache.get(revoked_key(jti)) is not None
@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from users.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+BLOOM_ENABLED = getattr(settings, 'USER_BLOOM_FILTER_ENABLED', False)
+BLOOM_CAPACITY = getattr(settings, 'USER_BLOOM_FILTER_CAPACITY', 1_000_000)
+BLOOM_ERROR_RATE = getattr(settings, 'USER_BLOOM_FILTER_ERROR_RATE', 0.01)
+BLOOM_REBUILD_SECONDS = getattr(settings, 'USER_BLOOM_FILTER_REBUILD_SECONDS', 300)
+
+# Bumped by writes that bypass post_save (bulk imports), makes every process's filter stale.
+GENERATION_KEY = "known_users_generation"
+
+EMAIL_TAKEN = "Email already exists."
+PHONE_TAKEN = "Phonr number already exists."
+
+
+class KnownUsersFilter:
+    """
+    Per-process Bloom filter of every registered email and phone number.
+
+    A miss means the value is definitely not taken (as of the last rebuild), so
+    the DB lookup can be skipped. Users created in this process are added as they
+    are saved; users created by other processes show up at the next rebuild, and
+    until then the unique constraints still catch them when the user is inserted.
+
+    The table scan never runs inside a request: get() returns the current filter,
+    or None before the first build, and starts a rebuild in a background thread
+    when the filter is missing, older than BLOOM_REBUILD_SECONDS or built before
+    the last mark_stale().
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._built_at = 0
+        self._generation = None
+        self._building = False
+        self._added_while_building = []
+        self._lock = threading.Lock()
+
+    def _key(self, field, value):
+        return f"{field}:{value}"
+
+    def _add(self, bloom, email, phone_number):
+        bloom.add(self._key('email', email))
+        bloom.add(self._key('phone_number', phone_number))
+
+    def build(self):
+        User = get_user_model()
+        total = User.objects.count()
+        bloom = BloomFilter(max(BLOOM_CAPACITY, total * 2), BLOOM_ERROR_RATE)
+        for email, phone_number in User.objects.values_list('email', 'phone_number').iterator(chunk_size=10000):
+            self._add(bloom, email, phone_number)
+        return bloom
+
+    def rebuild(self):
+        """
+        Build a new filter and swap it in. Users added while the table was being
+        scanned are replayed into it so none of them is lost by the swap.
+        """
+        with self._lock:
+            self._building = True
+            self._added_while_building = []
+        try:
+            generation = cache.get(GENERATION_KEY)
+            bloom = self.build()
+        except Exception:
+            with self._lock:
+                self._building = False
+            raise
+        with self._lock:
+            for email, phone_number in self._added_while_building:
+                self._add(bloom, email, phone_number)
+            self._added_while_building = []
+            self._filter = bloom
+            self._built_at = time.monotonic()
+            self._generation = generation
+            self._building = False
+        return bloom
+
+    def start_rebuild(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild_in_thread, daemon=True).start()
+
+    def _rebuild_in_thread(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Rebuilding the known users filter failed")
+        finally:
+            connection.close()
+
+    def is_fresh(self):
+        return (
+            self._filter is not None
+            and time.monotonic() - self._built_at <= BLOOM_REBUILD_SECONDS
+            and cache.get(GENERATION_KEY) == self._generation
+        )
+
+    def get(self):
+        if not self.is_fresh():
+            self.start_rebuild()
+        return self._filter
+
+    def add_user(self, email, phone_number):
+        with self._lock:
+            if self._building:
+                self._added_while_building.append((email, phone_number))
+            if self._filter is not None:
+                self._add(self._filter, email, phone_number)
+
+    def might_be_taken(self, email, phone_number):
+        """
+        False only when neither value can be taken; True while there is no filter yet.
+        """
+        bloom = self.get()
+        if bloom is None:
+            return True
+        return self._key('email', email) in bloom or self._key('phone_number', phone_number) in bloom
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._built_at = 0
+
+
+known_users = KnownUsersFilter()
+
+
+def mark_stale():
+    """
+    Have every process rebuild its filter, after users were added without post_save.
+    """
+    cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def taken_fields_query(email, phone_number):
+    User = get_user_model()
+    return User.objects.filter(Q(email=email) | Q(phone_number=phone_number)).values_list('email', 'phone_number')
+
+
+def collect_errors(rows, email, phone_number):
+    errors = {}
+    for existing_email, existing_phone in rows:
+        if existing_email == email:
+            errors['email'] = [EMAIL_TAKEN]
+        if existing_phone == phone_number:
+            errors['phone_number'] = [PHONE_TAKEN]
+    return errors
+
+
+def find_taken_fields(email, phone_number):
+    """
+    Return {field: [error]} for the fields already used by another user, with at most one query.
+    """
+    if BLOOM_ENABLED and not known_users.might_be_taken(email, phone_number):
+        return {}
+    return collect_errors(taken_fields_query(email, phone_number), email, phone_number)
+
+
+async def afind_taken_fields(email, phone_number):
+    if BLOOM_ENABLED and not known_users.might_be_taken(email, phone_number):
+        return {}
+    rows = [row async for row in taken_fields_query(email, phone_number)]
+    return collect_errors(rows, email, phone_number)
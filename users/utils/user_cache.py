@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.metrics import timed
+
+USER_CACHE_TTL = getattr(settings, 'USER_CACHE_TTL', 300)
+
+# A cached user lives under auth_user_<id>_<version>, and the rendered profile
+# JSON under profile_<id>_<version>. Changing the user bumps user_version_<id>,
+# which makes every older entry unreachable, including one that a concurrent
+# request is about to write with the version it read before.
+#
+# Without USER_CACHE_ENABLED (no shared cache) every function here is a miss or
+# a no-op, and callers go to the database.
+
+
+def is_enabled():
+    return getattr(settings, 'USER_CACHE_ENABLED', False)
+
+
+def version_key(user_id):
+    return f"user_version_{user_id}"
+
+
+def entry_key(user_id, version):
+    return f"auth_user_{user_id}_{version}"
+
+
+def profile_key(user_id, version):
+    return f"profile_{user_id}_{version}"
+
+
+def get_version(user_id):
+    if not is_enabled():
+        return None
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # Time based so a version key that was evicted never comes back with an old value.
+        cache.add(version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+@timed('cache')
+def get_cached_user(user_id):
+    """
+    Return (user, version), user is None on a miss.
+    """
+    version = get_version(user_id)
+    if version is None:
+        return None, None
+    return cache.get(entry_key(user_id, version)), version
+
+
+@timed('cache')
+def cache_user(user, version):
+    if version is None:
+        return
+    cache.set(entry_key(user.pk, version), user, timeout=USER_CACHE_TTL)
+
+
+@timed('cache')
+def get_cached_profile(user_id, version):
+    """
+    Return (last_modified, body) of the rendered profile, or None on a miss.
+    """
+    if version is None:
+        return None
+    return cache.get(profile_key(user_id, version))
+
+
+@timed('cache')
+def cache_profile(user_id, version, last_modified, body):
+    if version is None:
+        return
+    cache.set(profile_key(user_id, version), (last_modified, body), timeout=USER_CACHE_TTL)
+
+
+def invalidate_user(user_id):
+    if not is_enabled():
+        return
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        # No version yet, so nothing is cached for this user.
+        pass
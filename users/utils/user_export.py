@@ -0,0 +1,67 @@
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+
+EXPORT_FIELDS = [
+    'id', 'email', 'full_name', 'phone_number', 'role', 'gender',
+    'date_of_birth', 'is_active', 'is_staff', 'date_joined',
+]
+
+
+def filtered_users(role=None, is_active=None, joined_after=None, joined_before=None):
+    queryset = get_user_model().objects.all()
+    if role:
+        queryset = queryset.filter(role=role)
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    if joined_after:
+        queryset = queryset.filter(date_joined__gte=joined_after)
+    if joined_before:
+        queryset = queryset.filter(date_joined__lt=joined_before)
+    return queryset
+
+
+def iter_user_rows(queryset, after_id=0, chunk_size=2000):
+    """
+    Yield value tuples of EXPORT_FIELDS in id order, one keyset page
+    (`id > last id`) at a time, so memory stays flat whatever the table size.
+    """
+    last_id = after_id or 0
+    while True:
+        page = (
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list(*EXPORT_FIELDS)[:chunk_size]
+        )
+        count = 0
+        for row in page.iterator(chunk_size=chunk_size):
+            count += 1
+            last_id = row[0]
+            yield row
+        if count < chunk_size:
+            return
+
+
+class Echo:
+    """
+    File-like object whose write() returns the value, for csv.writer in a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_jsonl(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + "\n"
+
+
+RENDERERS = {'csv': render_csv, 'jsonl': render_jsonl}
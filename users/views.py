@@ -1,72 +1,152 @@
-import os, random
-import requests
-from django.core.cache import cache
-from django.core.mail import send_mail
-from django.utils import timezone
-from dotenv import load_dotenv
+import hashlib
+import random
+import time
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
-from rest_framework.permissions import AllowAny 
+from rest_framework.renderers import JSONRenderer
+from rest_framework.permissions import AllowAny, IsAdminUser
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from django.utils.dateparse import parse_datetime
+from django.db import IntegrityError
+from .metrics import otp_events, render as render_metrics, timed
 from .serializers import RegisterUserSerializer, LoginSerializer, UserProfileSerializer
+from .throttling import SlidingWindowThrottle
+from .tokens import CachedBlacklistRefreshToken
 from .utils.generate_reset_token import generate_reset_token, decode_reset_token
+from .utils.otp_outbox import enqueue_otp
+from .utils.email_validation import validate_email_with_mailboxlayer
+from .utils import otp_store, stateless_otp
+from .utils.uniqueness import find_taken_fields
+from .utils.user_export import RENDERERS, filtered_users, iter_user_rows
+from .utils.pending_registration import PendingRegistration, hash_otp, otp_matches
+from .utils.user_cache import cache_profile, get_cached_profile, get_version
 
 
-load_dotenv()
 User = get_user_model()
-OTP_EXPIRY_SECONDS = 600 # 10 minutes
-MAX_OTP_ATTEMPTS = 3
+OTP_EXPIRY_SECONDS = otp_store.OTP_EXPIRY_SECONDS
+MAX_OTP_ATTEMPTS = otp_store.MAX_OTP_ATTEMPTS
 
-def validate_email_with_mailboxlayer(email):
+def generate_otp(email):
+    if stateless_otp.is_stateless():
+        return stateless_otp.derive_otp(email)
+    return str(random.randint(100000, 999999))
+
+def otp_email(otp):
     """
-    validate email is abel to recieve email or not using mailboxlayer API
+    Subject and body of the OTP email.
     """
+    return "your OTP for Verification of Registration", f"Your OTP is {otp}. It is valid for 10 minutes."
 
-    api_key = os.getenv('MAILBOXLAYER_API_KEY')
-    if not api_key:
-        raise ValueError("Mailbox Layer API keyv not found in environment variables, please set it up.")
-    
-    url = f"http://apilayer.net/api/check?access_key={api_key}&email={email}&smtp=1&format=1"
-    try:
-        response = requests.get(url).json()
-        if response.get("smtp_check"):
-            return True
-        else:
-            return False, "Invalid email address."
-    except requests.ResponseError as e:
-        return False, f"Email validation failed: {e}"
-    
-def generate_and_send_otp(email):
-    otp = str(random.randint(100000, 999999))
+def otp_sent_message(channel):
+    """
+    Response message for an OTP queued on `channel`.
+    """
+    return "OTP sent to your phone." if channel == 'sms' else "OTP sent to your email."
+
+@timed('otp_send')
+def generate_and_send_otp(email, phone_number=None, channel=None):
+    """
+    Generate an OTP and queue it in the outbox, delivery is done by the outbox workers.
+    It goes out on `channel` (email or sms) and falls back to the other one.
+    Returns (otp, channel it was queued on), or (None, error) when queueing failed.
+    """
+    otp = generate_otp(email)
+    subject, message = otp_email(otp)
     
     try:
-        send_mail(
-            subject="your OTP for Verification of Registration",
-            message=f"Your OTP is {otp}. It is valid for 10 minutes.",
-            from_email=os.getenv('DEFAULT_FROM_EMAIL'),
-            recipient_list=[email],
-            fail_silently=False,   
-        )
-        return otp
+        item = enqueue_otp(email, subject=subject, message=message, phone_number=phone_number, channel=channel)
+        return otp, item.channel
     except Exception as e:
-        return False, f"Failed to send OTP: {e}"
+        return None, f"Failed to send OTP: {e}"
     
-def store_temp_user_data(email, data, otp):
+@timed('otp_store')
+def store_temp_user_data(email, record, otp):
     """
     Store temporary user data in cashe with OTP expiry time.
+    Only the compact encoded record and a keyed hash of the OTP are stored,
+    derived OTPs are not stored at all.
     """
+    otp_hash = None if stateless_otp.is_stateless() else hash_otp(email, otp)
+    otp_store.store_pending(email, record.encode(), otp_hash)
 
-    cache.set(
-        f"temp_user_data_{email}",
-        {
-            "data": data,
-            "otp" : otp,
-            "otp_attempts": 0,
-            "otp_expiry": timezone.now() + timezone.timedelta(seconds=OTP_EXPIRY_SECONDS),
-        }
-    )
+def duplicate_user_errors(email, phone_number):
+    """
+    Work out which field made a user INSERT fail, only called on the failure path.
+    """
+    return find_taken_fields(email, phone_number) or {"error": "User could not be created."}
+
+def verify_otp_and_create_user(email, otp_input):
+    """
+    Check `otp_input` against the pending registration of `email` and create the
+    user. Shared by VerifyOTPView and AsyncVerifyOTPView, returns (data, status).
+    """
+    raw_record = None
+    if stateless_otp.is_stateless():
+        # Pure CPU check, a wrong code only costs the attempt counter incr below.
+        otp_valid = stateless_otp.verify_derived_otp(email, otp_input)
+        attempts = 0
+        if otp_valid:
+            attempts, raw_record = otp_store.get_attempts_and_data(email)
+            if not raw_record:
+                otp_events.inc('expired')
+                return {"error": "OTP expired or invalid."}, status.HTTP_400_BAD_REQUEST
+    else:
+        otp_hash, attempts = otp_store.get_otp_state(email)
+        if not otp_hash:
+            otp_events.inc('expired')
+            return {"error": "OTP expired or invalid."}, status.HTTP_400_BAD_REQUEST
+        otp_valid = otp_matches(email, otp_input, otp_hash)
+
+    if attempts >= MAX_OTP_ATTEMPTS:
+        otp_events.inc('attempts_exceeded')
+        return {"error": "Maximum OTP attempts exceeded. Please register again."}, status.HTTP_403_FORBIDDEN
+
+    # Check OTP
+    if not otp_valid:
+        attempts = otp_store.record_failed_attempt(email)
+        if attempts is None:
+            otp_events.inc('expired')
+            return {"error": "OTP expired or invalid."}, status.HTTP_400_BAD_REQUEST
+
+        if attempts >= MAX_OTP_ATTEMPTS:
+            otp_store.clear_pending(email)
+            otp_events.inc('attempts_exceeded')
+            return {"error": "Maximum OTP attempts exceeded. Please register again."}, status.HTTP_403_FORBIDDEN
+
+        otp_events.inc('invalid')
+        return {"error": f"Invalid OTP. Attempt {attempts}/{MAX_OTP_ATTEMPTS}"}, status.HTTP_400_BAD_REQUEST
+
+    # If OTP is matched, create user and delete temporary data
+    if raw_record is None:
+        raw_record = otp_store.get_pending_data(email)
+    if not raw_record:
+        otp_events.inc('expired')
+        return {"error": "OTP expired or invalid."}, status.HTTP_400_BAD_REQUEST
+
+    record = PendingRegistration.decode(raw_record)
+    if record.is_expired():
+        otp_store.clear_pending(email)
+        otp_events.inc('expired')
+        return {"error": "OTP expired or invalid."}, status.HTTP_400_BAD_REQUEST
+
+    # The record was validated and its password hashed at registration, so this is one INSERT.
+    try:
+        User.objects.create_user_with_password_hash(
+            record.email, record.password_hash,
+            full_name=record.full_name, phone_number=record.phone_number,
+        )
+    except IntegrityError:
+        return duplicate_user_errors(record.email, record.phone_number), status.HTTP_400_BAD_REQUEST
+
+    otp_store.clear_pending(email)
+    otp_events.inc('verified')
+    return {"message": "User registered successfully."}, status.HTTP_201_CREATED
 
 # API VIEWS
 
@@ -75,6 +155,8 @@ class RegisterUserView(APIView):
     API View to register a new user via OTP and real-time email verification.
     """
     permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'register'
     
     def post(self, request):
         serializer = RegisterUserSerializer(data=request.data)
@@ -89,14 +171,15 @@ class RegisterUserView(APIView):
                 return Response({"error": "Invalid email address."}, status=status.HTTP_400_BAD_REQUEST)
             
             # 2. Generate and send OTP 
-            otp = generate_and_send_otp(email)
+            otp, channel = generate_and_send_otp(email, phone_number, serializer.validated_data.get('otp_channel'))
             if not otp:
                 return Response({"error": "Failed to send OTP."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
             # 3. Store temporary user data in cache with OTP expiry time
-            store_temp_user_data(email, serializer.validated_data, otp)
+            record = PendingRegistration.from_validated_data(serializer.validated_data, OTP_EXPIRY_SECONDS)
+            store_temp_user_data(email, record, otp)
 
-            return Response({"message": "OTP sent to your email."}, status=status.HTTP_200_OK)
+            return Response({"message": otp_sent_message(channel)}, status=status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -106,42 +189,12 @@ class VerifyOTPView(APIView):
     API View to verify OTP and create a new user 
     """
     permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'verify_otp'
 
     def post(self, request):
-        email = request.data.get("email")
-        otp_input = request.data.get("otp")
-
-        cached = cache.get(f"temp_user_data_{email}")
-        if not cached:
-            return Response({"error": "OTP expired or invalid."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check OTP
-        if cached["otp"] != otp_input:
-            cached["otp_attempts"] += 1
-            cache.set(f"temp_user_data_{email}", cached, timeout=OTP_EXPIRY_SECONDS)
-            
-            if cached["otp_attempts"] >= MAX_OTP_ATTEMPTS:
-                cache.delete(f"temp_user_data_{email}")
-                return Response(
-                    {"error": "Maximum OTP attempts exceeded. Please register again."},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-            cache.set(f"temp_user_data_{email}", cached, timeout=OTP_EXPIRY_SECONDS)
-            return Response(
-                {"error": f"Invalid OTP. Attempt {cached['otp_attempts']}/{MAX_OTP_ATTEMPTS}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # If OTP is matched, create user and delete temporary data
-        user_data = cached["data"]
-        serializer = RegisterUserSerializer(data=user_data)
-
-        if serializer.is_valid():
-            serializer.save()
-            cache.delete(f"temp_user_data_{email}")
-            return Response({"message": "User registered successfully."}, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data, status_code = verify_otp_and_create_user(request.data.get("email"), request.data.get("otp"))
+        return Response(data, status=status_code)
 
 
 class LoginView(APIView):
@@ -149,13 +202,15 @@ class LoginView(APIView):
         Login API View for user login and token generation.
     """
     permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
 
         if serializer.is_valid():
             user = serializer.validated_data['user']  # Get the validated user directly
-            refresh = RefreshToken.for_user(user)
+            refresh = CachedBlacklistRefreshToken.for_user(user)
             return Response({
                 'access': str(refresh.access_token),
                 'refresh': str(refresh),
@@ -178,7 +233,7 @@ class LogoutView(APIView):
             
             # Blacklist the refresh token ti invalidate token
             try:
-                token = RefreshToken(refresh_token)
+                token = CachedBlacklistRefreshToken(refresh_token)
                 token.blacklist()
                 return Response({"message": "sucessfully logged out."}, status=status.HTTP_205_RESET_CONTENT)
             except Exception as e:
@@ -190,6 +245,8 @@ class LogoutView(APIView):
 
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'forgot_password'
     def post(self, request):
         email = request.data.get("email")
 
@@ -230,9 +287,32 @@ class UserProfileAPIView(APIView):
     def get(self, request):
         """
         Get the current user's profile.
+        The rendered JSON is cached per user version (bumped whenever the user is
+        saved, so PUT / PATCH / DELETE invalidate it) and the ETag is a hash of it:
+        a polling client with a current If-None-Match gets a 304 after one cache read.
+        A write that skips save() (QuerySet.update()) shows up once the cached
+        rendering expires, after USER_CACHE_TTL at most.
         """
-        serializer = UserProfileSerializer(request.user)
-        return Response(serializer.data)
+        user = request.user
+        version = getattr(request, 'user_cache_version', None)
+        if version is None:
+            version = get_version(user.pk)
+
+        cached = get_cached_profile(user.pk, version)
+        if cached is None:
+            cached = (time.time(), JSONRenderer().render(UserProfileSerializer(user).data))
+            cache_profile(user.pk, version, *cached)
+        last_modified, body = cached
+        etag = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+
+        response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['Last-Modified'] = http_date(last_modified)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Authorization'])
+        return response
     
     def put(self, request):
         """
@@ -242,7 +322,7 @@ class UserProfileAPIView(APIView):
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def patch(self, request):
         """
@@ -265,4 +345,63 @@ class UserProfileAPIView(APIView):
         return Response({'message': 'user deactivated successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
 
+class UserExportView(APIView):
+    """
+    Staff-only streaming export of users as CSV or JSON Lines.
+    Query params: file_format, role, is_active, joined_after, joined_before, after_id.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        # Not `format`: DRF reserves that name for its URL format override.
+        export_format = params.get('file_format', 'csv')
+        if export_format not in RENDERERS:
+            return Response({"error": "file_format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # A filter that can't be parsed is an error, dropping it would export every user.
+        joined = {}
+        for name in ('joined_after', 'joined_before'):
+            joined[name] = None
+            if params.get(name):
+                try:
+                    joined[name] = parse_datetime(params[name])
+                except ValueError:
+                    pass
+                if joined[name] is None:
+                    return Response({"error": f"{name} must be an ISO datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        is_active = params.get('is_active')
+        if is_active is not None:
+            if is_active.lower() not in ('true', 'false'):
+                return Response({"error": "is_active must be true or false."}, status=status.HTTP_400_BAD_REQUEST)
+            is_active = is_active.lower() == 'true'
+
+        try:
+            after_id = int(params.get('after_id', 0))
+        except ValueError:
+            return Response({"error": "after_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = filtered_users(role=params.get('role'), is_active=is_active, **joined)
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            RENDERERS[export_format](iter_user_rows(queryset, after_id=after_id)),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="users.{export_format}"'
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of this process's metrics. The scraper must send
+    `Authorization: Bearer <METRICS_TOKEN>`; without a METRICS_TOKEN the endpoint
+    is disabled.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    if not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 